@@ -661,6 +661,12 @@ class ThriftAuthHandler:
                                    user_name=self.getLoggedInUser())
 
             session.commit()
+
+            # The superuser permission of the users is cached by the session
+            # manager.
+            if perm == permissions.SUPERUSER:
+                self.__manager.invalidate_root_users()
+
             return True
 
     @timeit
@@ -683,6 +689,12 @@ class ThriftAuthHandler:
                                       user_name=self.getLoggedInUser())
 
             session.commit()
+
+            # The superuser permission of the users is cached by the session
+            # manager.
+            if perm == permissions.SUPERUSER:
+                self.__manager.invalidate_root_users()
+
             return True
 
     @timeit
@@ -743,6 +755,7 @@ class ThriftAuthHandler:
 
             # Invalidate the local session by token.
             self.__manager.invalidate_local_session(token)
+            self.__manager.invalidate_personal_access_token(user, token)
 
             LOG.info("Personal access token '%s...' has been removed by '%s'.",
                      token[:5], self.getLoggedInUser())
@@ -851,9 +864,12 @@ class ThriftAuthHandler:
                     f"Personal access token with name '{name}' was not found "
                     f"in the database for the user '{user}'.")
 
+            token = personal_access_token.token
             personal_access_token_q.delete()
             session.commit()
 
+            self.__manager.invalidate_personal_access_token(user, token)
+
             LOG.info(
                 "Personal access token with name '%s' has been removed by "
                 "'%s'.", name, user)
@@ -14,6 +14,7 @@ import sys
 from sqlalchemy import Boolean, CHAR, Column, DateTime, Enum, ForeignKey, \
     Integer, MetaData, String, Text, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql.expression import false
 
 from ..permissions import get_permissions
@@ -127,7 +128,7 @@ class Session(Base):
     # List of group names separated by semicolons.
     groups = Column(String)
 
-    last_access = Column(DateTime, nullable=False)
+    last_access = Column(DateTime, nullable=False, index=True)
 
     # Token description.
     description = Column(String)
@@ -220,14 +221,21 @@ class OAuthToken(Base):
                              ForeignKey('auth_sessions.id',
                                         deferrable=False,
                                         ondelete='CASCADE'),
-                             nullable=False)
+                             nullable=False, index=True)
+
+    # The foreign key is filled from the session when the token is flushed,
+    # so a new session and its token can be stored in the same flush.
+    session = relationship(Session, uselist=False)
 
     def __init__(self, access_token, expires_at, refresh_token,
-                 auth_session_id):
+                 auth_session_id=None, session=None):
         self.access_token = access_token
         self.expires_at = expires_at
         self.refresh_token = refresh_token
-        self.auth_session_id = auth_session_id
+        if session is not None:
+            self.session = session
+        else:
+            self.auth_session_id = auth_session_id
 
 
 IDENTIFIER = {
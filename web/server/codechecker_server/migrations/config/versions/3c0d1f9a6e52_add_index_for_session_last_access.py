@@ -0,0 +1,30 @@
+"""
+last_access INDEX for auth_sessions
+
+Revision ID: 3c0d1f9a6e52
+Revises:     7ed50f8b3fb8
+Create Date: 2026-10-15 10:12:37.418265
+
+
+Add INDEX for the last_access column in the auth_sessions table to speed up
+the removal of expired sessions.
+"""
+
+from alembic import op
+
+
+# Revision identifiers, used by Alembic.
+revision = '3c0d1f9a6e52'
+down_revision = '7ed50f8b3fb8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(op.f('ix_auth_sessions_last_access'), 'auth_sessions',
+                    ['last_access'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_auth_sessions_last_access'),
+                  table_name='auth_sessions')
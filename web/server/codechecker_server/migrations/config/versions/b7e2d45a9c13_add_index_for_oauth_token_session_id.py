@@ -0,0 +1,31 @@
+"""
+auth_session_id INDEX for oauth_tokens
+
+Revision ID: b7e2d45a9c13
+Revises:     3c0d1f9a6e52
+Create Date: 2026-10-15 11:40:46.513027
+
+
+Add INDEX for the auth_session_id column in the oauth_tokens table. The
+tokens are looked up by this column when their session is deleted. The token
+column of auth_sessions is already indexed by its UNIQUE constraint.
+"""
+
+from alembic import op
+
+
+# Revision identifiers, used by Alembic.
+revision = 'b7e2d45a9c13'
+down_revision = '3c0d1f9a6e52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(op.f('ix_oauth_tokens_auth_session_id'), 'oauth_tokens',
+                    ['auth_session_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_oauth_tokens_auth_session_id'),
+                  table_name='oauth_tokens')
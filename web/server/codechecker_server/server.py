@@ -809,7 +809,8 @@ class CCSimpleHttpServer(HTTPServer):
         LOG.debug("Creating database engine for CONFIG DATABASE...")
         self.__engine = product_db_sql_server.create_engine()
         self.config_session = sessionmaker(bind=self.__engine)
-        self.manager.set_database_connection(self.config_session)
+        self.manager.set_database_connection(self.config_session,
+                                             self.__engine)
 
         # Load the initial list of products and set up the server.
         cfg_sess = self.config_session()
@@ -911,6 +912,7 @@ class CCSimpleHttpServer(HTTPServer):
         Terminating the server.
         """
         try:
+            self.manager.shutdown()
             self.server_close()
             self.__engine.dispose()
         except Exception as ex:
@@ -1181,18 +1183,33 @@ def start_server(config_directory, package_data, port, config_sql_server,
 
     def signal_handler(signum, _):
         """
-        Handle SIGTERM to stop the server running.
+        Handle SIGTERM to stop the server running. The server is terminated
+        after serve_forever() is left, outside of the signal handler, as the
+        shutdown may need locks held by the interrupted code.
         """
         LOG.info("Shutting down the WEB server on [%s:%d]",
                  '[' + listen_address + ']'
                  if server_clazz is CCSimpleHttpServerIPv6 else listen_address,
                  port)
-        http_server.terminate()
+        sys.exit(128 + signum)
 
-        # Terminate child processes.
-        for pp in processes:
-            pp.terminate()
+    def serve_worker():
+        """
+        Serve the requests in a worker process until it is terminated. The
+        pending session accesses of the worker are written to the database
+        before it exits.
+        """
+        signal.signal(signal.SIGINT, worker_signal_handler)
+        signal.signal(signal.SIGTERM, worker_signal_handler)
+        try:
+            http_server.serve_forever()
+        finally:
+            manager.shutdown()
 
+    def worker_signal_handler(signum, _):
+        """
+        Handle SIGTERM to stop a worker process.
+        """
         sys.exit(128 + signum)
 
     def reload_signal_handler(*_args, **_kwargs):
@@ -1228,7 +1245,7 @@ def start_server(config_directory, package_data, port, config_sql_server,
     atexit.register(unregister_handler, os.getpid())
 
     for _ in range(manager.worker_processes - 1):
-        p = multiprocess.Process(target=http_server.serve_forever)
+        p = multiprocess.Process(target=serve_worker)
         processes.append(p)
         p.start()
 
@@ -1238,8 +1255,15 @@ def start_server(config_directory, package_data, port, config_sql_server,
     if sys.platform != "win32":
         signal.signal(signal.SIGHUP, reload_signal_handler)
 
-    # Main process also acts as a worker.
-    http_server.serve_forever()
+    try:
+        # Main process also acts as a worker.
+        http_server.serve_forever()
+    finally:
+        http_server.terminate()
+
+        # Terminate child processes.
+        for pp in processes:
+            pp.terminate()
 
     LOG.info("Webserver quit.")
 
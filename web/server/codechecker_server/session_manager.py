@@ -9,15 +9,25 @@
 Handles the management of authentication sessions on the server's side.
 """
 
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+import hmac
 import json
 import os
 import re
-import uuid
+import secrets
+import string
+import sys
+import threading
+import time
 
-from datetime import datetime
+from datetime import datetime, timedelta
 import hashlib
+import heapq
 from typing import Optional
 
+from sqlalchemy import bindparam, exists, or_, select
+
 from codechecker_common.compatibility.multiprocessing import cpu_count
 from codechecker_common.logger import get_logger
 from codechecker_common.util import load_json
@@ -49,12 +59,102 @@ except ImportError:
 LOG = get_logger("server")
 SESSION_COOKIE_NAME = _SCN
 
+# Default lifetime (in seconds) and capacity of the cache of personal access
+# token validation results.
+PERSONAL_ACCESS_TOKEN_CACHE_TTL = 60
+PERSONAL_ACCESS_TOKEN_CACHE_SIZE = 4096
+
+# Lifetime (in seconds) and capacity of the cache of session tokens which
+# were not found in the database.
+REJECTED_SESSION_TOKEN_CACHE_TTL = 60
+REJECTED_SESSION_TOKEN_CACHE_SIZE = 4096
+
+# Lifetime (in seconds) and capacity of the cache of the users' superuser
+# permission. The cache is cleared when the superuser permission is changed,
+# the other server processes see the change on new sessions after this time.
+ROOT_USER_CACHE_TTL = 5
+ROOT_USER_CACHE_SIZE = 1024
+
+# Default interval (in seconds) of the background cleanup of expired sessions.
+SESSION_CLEANUP_INTERVAL = 60
+
+# Time (in seconds) the shutdown waits for the final write of the pending
+# session accesses.
+SESSION_ACCESS_FLUSH_TIMEOUT = 10
+
 
 def generate_session_token():
     """
     Returns a random session token.
     """
-    return uuid.UUID(bytes=os.urandom(16)).hex
+    return secrets.token_hex(16)
+
+
+@lru_cache(maxsize=64)
+def _callback_url_pattern(provider_name):
+    """
+    Returns the compiled regular expression of the valid callback URLs of the
+    given OAuth provider.
+    """
+    protocol = "http(s|)"
+    website = "[a-zA-Z0-9.-_]+([:][0-9]{2,5})?(?<!/)"
+    paths = "login[/]OAuthLogin"
+
+    return re.compile(
+        rf"^{protocol}://{website}/(?!/){paths}/{re.escape(provider_name)}$")
+
+
+@lru_cache(maxsize=256)
+def _parse_template(template):
+    """ Returns the parsed fields of the given str.format() template. """
+    return tuple(string.Formatter().parse(template))
+
+
+def _apply_template(template, variables):
+    """
+    Substitute the given variables into the given str.format() template.
+    Raises KeyError if the template refers to an undefined variable.
+    """
+    if '{' not in template and '}' not in template:
+        return template
+
+    parts = []
+    for literal, field, spec, conversion in _parse_template(template):
+        parts.append(literal)
+        if field is not None:
+            value = variables[field]
+            if conversion:
+                value = {'r': repr, 's': str, 'a': ascii}[conversion](value)
+            parts.append(format(value, spec))
+
+    return ''.join(parts)
+
+
+@lru_cache(maxsize=1024)
+def _split_groups(groups_str):
+    """
+    Returns the group names of the given ';' separated list. The result is
+    shared by the sessions with the same groups.
+    """
+    return tuple(sys.intern(group) for group in groups_str.split(';')) \
+        if groups_str else ()
+
+
+def _compile_group_regexes(regex_list):
+    """
+    Returns the compiled regular expressions of a group of 'regex_groups'.
+
+    The expressions are joined into one alternation, so a single search
+    matches any of them, unless that would change their meaning: inline
+    flags (e.g. "(?i)") apply to the whole expression and the numbering of
+    the groups (used by backreferences) would be shifted.
+    """
+    patterns = [re.compile(regex) for regex in regex_list]
+    if len(patterns) > 1 and \
+            all(p.flags == re.UNICODE and not p.groups for p in patterns):
+        return (re.compile('|'.join(f'(?:{p.pattern})' for p in patterns)),)
+
+    return tuple(patterns)
 
 
 def get_worker_processes(scfg_dict):
@@ -75,12 +175,77 @@ def get_worker_processes(scfg_dict):
     return worker_processes
 
 
+# A user of the dictionary authentication method, parsed from its
+# 'username:password_hash:hash_algorithm:salt' formatted entry. Everything
+# after the user name is kept as the password of the legacy
+# 'username:password' format, it is None if the entry has no password.
+# 'hash_function' is the hashlib constructor of the hash algorithm, or None if
+# the entry has no (valid) hash algorithm.
+_DictionaryUser = namedtuple('_DictionaryUser',
+                             ['password', 'password_hash',
+                              'hash_function', 'salt', 'groups'])
+
+
+class _TTLCache:
+    """
+    A size-bounded in-memory cache whose entries expire after a given number
+    of seconds. If the cache is full, the least recently used entry is
+    dropped.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.__max_size = max_size
+        self.__ttl = ttl
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the value stored for the given key or the default value if
+        the key is not cached or its entry has expired.
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                return default
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.__entries[key]
+                return default
+
+            self.__entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """ Store the given value for the given key. """
+        if self.__max_size <= 0 or self.__ttl <= 0:
+            return
+
+        with self.__lock:
+            self.__entries[key] = (time.monotonic() + self.__ttl, value)
+            self.__entries.move_to_end(key)
+
+            while len(self.__entries) > self.__max_size:
+                self.__entries.popitem(last=False)
+
+    def pop(self, key):
+        """ Remove the entry of the given key from the cache. """
+        with self.__lock:
+            self.__entries.pop(key, None)
+
+    def clear(self):
+        """ Remove every entry from the cache. """
+        with self.__lock:
+            self.__entries.clear()
+
+
 class _Session:
     """A session for an authenticated, privileged client connection."""
 
     def __init__(self, token, username, groups,
-                 session_lifetime, refresh_time, is_root=False, database=None,
-                 last_access=None):
+                 session_lifetime, refresh_time, is_root=False,
+                 mark_accessed=None, last_access=None):
 
         self.token = token
         self.user = username
@@ -89,12 +254,32 @@ class _Session:
         self.session_lifetime = session_lifetime
         self.refresh_time = refresh_time if refresh_time else None
         self.__root = is_root
-        self.__database = database
-        self.last_access = last_access if last_access else datetime.now()
+        self.__mark_accessed = mark_accessed
+        self.__revalidating = threading.Lock()
+
+        # The time of the last access is stored as a time.monotonic() value.
+        # The last access time given as a datetime (e.g. read from the
+        # database) is converted to this clock.
+        self.last_access = time.monotonic()
+        if last_access:
+            self.last_access -= (datetime.now() - last_access).total_seconds()
 
     def get_access_token(self):
         return self.oauth_access_token
 
+    @property
+    def groups(self):
+        """ Returns the names of the groups the user of the session is in. """
+        return self.__groups
+
+    @groups.setter
+    def groups(self, groups):
+        # The group names are interned, so the many sessions of the same
+        # groups share the strings, and the ';' separated form stored in the
+        # database is computed only once.
+        self.__groups = tuple(sys.intern(group) for group in groups)
+        self.groups_str = ';'.join(self.__groups)
+
     @property
     def is_root(self):
         """Returns whether or not the Session was created with the master
@@ -109,8 +294,20 @@ class _Session:
         if not self.refresh_time:
             return True
 
-        return (datetime.now() - self.last_access).total_seconds() > \
-            self.refresh_time
+        return time.monotonic() - self.last_access > self.refresh_time
+
+    @property
+    def evict_time(self):
+        """
+        Returns the time.monotonic() value after which the session can be
+        dropped from the local in memory store, that is, when its refresh time
+        or its lifetime expires.
+        """
+        if not self.refresh_time:
+            return self.last_access
+
+        return self.last_access + min(self.refresh_time,
+                                      self.session_lifetime)
 
     @property
     def is_alive(self):
@@ -119,8 +316,7 @@ class _Session:
         lifetime.
         """
 
-        return (datetime.now() - self.last_access).total_seconds() <= \
-            self.session_lifetime
+        return time.monotonic() - self.last_access <= self.session_lifetime
 
     def revalidate(self):
         """
@@ -128,34 +324,36 @@ class _Session:
         lifetime. After a session hasn't been used for this interval,
         it can NOT be resurrected at all --- the user needs to log in
         to a brand-new session.
+
+        Returns whether the session is alive.
         """
+        # The clock is read once for both the lifetime and the refresh time
+        # check, as this is called for every request of the session.
+        idle_time = time.monotonic() - self.last_access
+        if idle_time > self.session_lifetime:
+            return False
 
-        if not self.is_alive:
-            return
+        if not self.__mark_accessed or \
+                (self.refresh_time and idle_time <= self.refresh_time):
+            return True
 
-        if self.__database and self.is_refresh_time_expire:
-            self.last_access = datetime.now()
+        # Only one of the concurrent requests of the session revalidates it,
+        # the others go on with its current state.
+        if not self.__revalidating.acquire(blocking=False):
+            return True
 
-            # Update the timestamp in the database for the session's last
-            # access.
-            transaction = None
-            try:
-                transaction = self.__database()
-                record = transaction.query(SessionRecord) \
-                    .filter(SessionRecord.user_name == self.user) \
-                    .filter(SessionRecord.token == self.token) \
-                    .limit(1).one_or_none()
-
-                if record:
-                    record.last_access = self.last_access
-                    transaction.commit()
-            except Exception as e:
-                LOG.warning("Couldn't update usage timestamp of %s",
-                            self.token)
-                LOG.warning(str(e))
-            finally:
-                if transaction:
-                    transaction.close()
+        try:
+            if self.is_refresh_time_expire:
+                self.last_access = time.monotonic()
+
+                # The timestamp of the session's last access is written to
+                # the database later, in a batch with the other accessed
+                # sessions.
+                self.__mark_accessed(self)
+        finally:
+            self.__revalidating.release()
+
+        return True
 
 
 class SessionManager:
@@ -174,8 +372,35 @@ class SessionManager:
             configuration file disables authentication.
         """
         self.__database_connection = None
-        self.__logins_since_prune = 0
-        self.__sessions = []
+        self.__database_engine = None
+
+        # Local sessions indexed by their token, and the tokens of the local
+        # sessions indexed by the name of the user they belong to.
+        self.__sessions = {}
+        self.__sessions_by_user = {}
+
+        # Min-heap of (evict time, token) pairs of the local sessions, so the
+        # cleanup only has to visit the sessions which may be expired. The
+        # entries of removed or revalidated sessions are skipped or
+        # rescheduled lazily.
+        self.__session_evictions = []
+
+        # The local session store is also modified by the background cleanup
+        # thread of the server process. The lock serializes the writers of
+        # the store, readers rely on the atomic operations of dict.
+        self.__sessions_lock = threading.RLock()
+        self.__cleanup_pid = None
+
+        # Stops the background threads of the session manager.
+        self.__shutdown_event = threading.Event()
+
+        # Last access timestamps of the sessions which are not yet written
+        # to the database, indexed by session token. These are flushed
+        # periodically by a background thread of the server process.
+        self.__accessed_sessions = {}
+        self.__accessed_sessions_lock = threading.Lock()
+        self.__flusher_pid = None
+        self.__flusher = None
         self.__configuration_file = configuration_file
 
         self.scfg_dict = self.__get_config_dict()
@@ -186,21 +411,56 @@ class SessionManager:
         # instantiate SessionManager with the found configuration.
         self.__worker_processes = get_worker_processes(self.scfg_dict)
         self.__max_run_count = self.scfg_dict.get('max_run_count', None)
-        self.__store_config = self.scfg_dict.get('store', {})
-        self.__keepalive_config = self.scfg_dict.get('keepalive', {})
+        self.__set_store_config(self.scfg_dict.get('store', {}))
+
+        # The keepalive options are read for every connection, so these are
+        # looked up only once.
+        keepalive_config = self.scfg_dict.get('keepalive', {})
+        self.__keepalive_enabled = keepalive_config.get('enabled')
+        self.__keepalive_idle = keepalive_config.get('idle')
+        self.__keepalive_interval = keepalive_config.get('interval')
+        self.__keepalive_max_probe = keepalive_config.get('max_probe')
         self.__auth_config = self.scfg_dict['authentication']
 
         if force_auth:
             LOG.debug("Authentication was force-enabled.")
             self.__auth_config['enabled'] = True
 
+        self.__oauth_providers = self.__auth_config \
+            .setdefault('method_oauth', {}).setdefault('providers', {})
+
         if 'soft_expire' in self.__auth_config:
             LOG.debug("Found deprecated argument 'soft_expire' in "
                       "server_config.authentication.")
 
+        if 'logins_until_cleanup' in self.__auth_config:
+            LOG.warning("Found deprecated argument 'logins_until_cleanup' "
+                        "in server_config.authentication, it is ignored. "
+                        "Expired sessions are cleaned up in every "
+                        "'cleanup_interval' seconds instead.")
+
         self.__refresh_time = self.__auth_config['refresh_time'] \
             if 'refresh_time' in self.__auth_config else None
 
+        # Results of personal access token validations, keyed by the digest
+        # of the auth string. Failed validations are cached too, so guessing
+        # tokens does not hit the database on every attempt.
+        self.__pat_cache = _TTLCache(
+            self.__auth_config.get('personal_access_token_cache_size',
+                                   PERSONAL_ACCESS_TOKEN_CACHE_SIZE),
+            self.__auth_config.get('personal_access_token_cache_ttl',
+                                   PERSONAL_ACCESS_TOKEN_CACHE_TTL))
+
+        # Session tokens which are known to be invalid. Clients keep sending
+        # their stale cookies, these are rejected without a database query.
+        self.__rejected_session_tokens = _TTLCache(
+            REJECTED_SESSION_TOKEN_CACHE_SIZE,
+            REJECTED_SESSION_TOKEN_CACHE_TTL)
+
+        # Whether the users have system permissions, indexed by user name.
+        self.__root_users = _TTLCache(ROOT_USER_CACHE_SIZE,
+                                      ROOT_USER_CACHE_TTL)
+
         self.__regex_groups_enabled = False
 
         # Pre-compile the regular expressions of 'regex_groups'
@@ -212,9 +472,12 @@ class SessionManager:
                                .get('groups', [])
             d = {}
             for group_name, regex_list in regex_groups.items():
-                d[group_name] = [re.compile(r) for r in regex_list]
+                if regex_list:
+                    d[group_name] = _compile_group_regexes(regex_list)
             self.__group_regexes_compiled = d
 
+        self.__dictionary_users = self.__parse_dictionary_users()
+
         # If no methods are configured as enabled, disable authentication.
         if self.scfg_dict['authentication'].get('enabled'):
             found_auth_method = False
@@ -247,8 +510,7 @@ class SessionManager:
                     self.__auth_config['method_oauth'].get('enabled'):
                 self.__oauth_apply_templates()
 
-                for _, provider in self.__auth_config['method_oauth'] \
-                                       .get("providers").items():
+                for provider in self.__oauth_providers.values():
                     if provider.get("enabled"):
                         found_auth_method = True
                         break
@@ -270,33 +532,80 @@ class SessionManager:
                                 "Falling back to no authentication.")
                     self.__auth_config['enabled'] = False
 
-    def __oauth_apply_templates(self):
-        providers = self.__auth_config.get(
-            'method_oauth', {}).get('providers', {})
+        self.__refresh_enabled_methods()
+
+    def __refresh_enabled_methods(self):
+        """ Collect the names of the enabled authentication methods. """
+        self.__enabled_methods = frozenset(
+            method for method in ('dictionary', 'pam', 'ldap', 'oauth')
+            if method not in UNSUPPORTED_METHODS and
+            self.__auth_config.get('method_' + method, {}).get('enabled'))
 
-        shared_variables = self.__auth_config.get(
-            'method_oauth', {}).get('shared_variables', {})
+    def __parse_dictionary_users(self):
+        """
+        Parse the credentials and the groups of the users of the dictionary
+        authentication method into records indexed by user name. If a user
+        name occurs multiple times, the first entry is used.
+        """
+        users = {}
+        method_config = self.__auth_config.get('method_dictionary') or {}
+        groups = method_config.get('groups', {})
+        for auth in method_config.get('auths', []):
+            auth_split = auth.split(':', 3)
+            username = auth_split[0]
+            if username in users:
+                continue
+
+            hash_algorithm = auth_split[2] if len(auth_split) > 2 else None
+
+            # An entry without a password does not accept any password.
+            users[username] = _DictionaryUser(
+                auth[len(username) + 1:].encode("utf-8")
+                if len(auth_split) > 1 else None,
+                auth_split[1].encode("utf-8") if len(auth_split) > 1 else b'',
+                getattr(hashlib, hash_algorithm, None)
+                if hash_algorithm else None,
+                auth_split[3] if len(auth_split) > 3 else '',
+                groups.get(username, []))
+
+        return users
+
+    def __oauth_apply_templates(self):
+        shared_variables = self.__auth_config['method_oauth'] \
+            .get('shared_variables', {})
 
-        for provider_name, provider in providers.items():
+        for provider_name, provider in self.__oauth_providers.items():
             if not provider.get('enabled'):
                 continue
 
+            # Turn off the provider if its credentials are left at the
+            # example values.
+            if provider.get("client_secret", "ExampleClientSecret") == \
+                    "ExampleClientSecret" or \
+                    provider.get("client_id", "ExampleClientID") == \
+                    "ExampleClientID":
+                LOG.error("OAuth configuration was set to default values. "
+                          "Disabling oauth provider: %s", provider_name)
+                provider['enabled'] = False
+                continue
+
             template_name = provider.get('template', 'default')
 
             if not OAUTH_TEMPLATES.get(template_name):
-                LOG.warning(f"OAuth provider {provider_name} tried to use "
-                            f"template '{template_name}', but it "
-                            " does not exist... Disabling OAuth provider "
-                            f"{provider_name}.")
+                LOG.warning("OAuth provider %s tried to use template '%s', "
+                            "but it does not exist... Disabling OAuth "
+                            "provider %s.",
+                            provider_name, template_name, provider_name)
                 provider['enabled'] = False
                 continue
 
             if template_name == 'default':
-                LOG.warning(f"OAuth provider {provider_name} tried to use the "
-                            "default template. This template does not support"
-                            " fetching of users or emails in this release. "
+                LOG.warning("OAuth provider %s tried to use the default "
+                            "template. This template does not support "
+                            "fetching of users or emails in this release. "
                             "Please use one of the available templates"
-                            f"... Disabling OAuth provider {provider_name}.")
+                            "... Disabling OAuth provider %s.",
+                            provider_name, provider_name)
                 provider['enabled'] = False
                 continue
 
@@ -319,20 +628,21 @@ class SessionManager:
                     continue
 
                 try:
-                    provider[param] = param_value.format(**variables)
+                    provider[param] = _apply_template(param_value, variables)
                     # Check the callback URL format if it is set correctly.
                     if param == 'callback_url':
                         if not self.check_callback_url_format(
                                 provider_name, provider[param]):
-                            LOG.error("Disabling OAuth "
-                                      f"provider {provider_name} "
-                                      "due to invalid callback URL format.")
+                            LOG.error("Disabling OAuth provider %s due to "
+                                      "invalid callback URL format.",
+                                      provider_name)
                             provider['enabled'] = False
                 except KeyError as e:
-                    LOG.warning(f"Parameter {param} in OAuth provider "
-                                f"{provider_name} tried accessing variable "
-                                f"{e.args[0]}, but it was not defined... "
-                                f"Disabling OAuth provider {provider_name}.")
+                    LOG.warning("Parameter %s in OAuth provider %s tried "
+                                "accessing variable %s, but it was not "
+                                "defined... Disabling OAuth provider %s.",
+                                param, provider_name, e.args[0],
+                                provider_name)
                     provider['enabled'] = False
                     break
 
@@ -341,60 +651,29 @@ class SessionManager:
         """
         Check the format of callback url using regex.
         """
-        print("Checking callback URL format for provider '%s': %s",
-              provider_name, callback_url)
         if "@" in provider_name:
-            LOG.warning(f"provider {provider_name} contains '@' "
-                        "which is not allowed, turning off provider.")
+            LOG.warning("provider %s contains '@' which is not allowed, "
+                        "turning off provider.", provider_name)
             return None
-        protocol = "http(s|)"
-        website = "[a-zA-Z0-9.-_]+([:][0-9]{2,5})?(?<!/)"
-        paths = "login[/]OAuthLogin"
-
-        pattern_str = (
-            rf"^{protocol}://{website}/(?!/){paths}/{provider_name}$"
-        )
-        pattern = re.compile(pattern_str)
         LOG.info("Checking callback URL format for provider '%s': %s",
                  provider_name, callback_url)
-        match = pattern.match(callback_url)
+        match = _callback_url_pattern(provider_name).match(callback_url)
         if match is None:
-            LOG.warning("Configuration format of callback_url is "
-                        f"invalid for provider {provider_name}. "
-                        "Please check the configuration file.")
+            LOG.warning("Configuration format of callback_url is invalid "
+                        "for provider %s. Please check the configuration "
+                        "file.", provider_name)
         return match is not None
 
     def get_oauth_providers(self):
-        result = []
-        providers = self.__auth_config.get(
-            'method_oauth', {}).get("providers", {})
-        for provider in providers:
-            if providers[provider].get('enabled', False):
-                result.append(provider)
-        return result
+        return [provider for provider, provider_cfg
+                in self.__oauth_providers.items()
+                if provider_cfg.get('enabled', False)]
 
     def turn_off_oauth_provider(self, provider_name: str):
-        oauth_config = self.scfg_dict['authentication']['method_oauth'] \
-            .get('providers', {})
-        oauth_config[provider_name]['enabled'] = False
+        self.__oauth_providers[provider_name]['enabled'] = False
 
     def get_oauth_config(self, provider):
-        provider_cfg = self.__auth_config.get(
-            'method_oauth', {}).get("providers", {}).get(provider, {})
-
-        # turn off configuration if it is set to default values
-        if provider_cfg.get("client_secret",
-                            "ExampleClientSecret") == "ExampleClientSecret" \
-                or provider_cfg.get("client_id",
-                                    "ExampleClientID") == "ExampleClientID":
-            self.__auth_config["method_oauth"]["providers"][provider][
-                "enabled"] = False
-
-            LOG.error("OAuth configuration was set to default values. " +
-                      "Disabling oauth provider: %s", provider)
-
-        return self.__auth_config.get(
-            'method_oauth', {}).get("providers", {}).get(provider, {})
+        return self.__oauth_providers.get(provider, {})
 
     def __get_config_dict(self):
         """
@@ -412,6 +691,20 @@ class SessionManager:
                              "empty.")
         return cfg_dict
 
+    def __set_store_config(self, store_config):
+        """
+        Set the 'store' config and the options read from it, so the getters
+        of these options do not look them up on every call.
+        """
+        self.__store_config = store_config
+
+        limit = store_config.get('limit', {})
+        self.__analysis_statistics_dir = \
+            store_config.get('analysis_statistics_dir')
+        self.__failure_zip_size = limit.get('failure_zip_size')
+        self.__compilation_database_size = \
+            limit.get('compilation_database_size')
+
     def reload_config(self):
         LOG.info("Reload server configuration file...")
         try:
@@ -424,19 +717,20 @@ class SessionManager:
                 LOG.debug("Changed 'max_run_count' value from %s to %s",
                           prev_max_run_count, new_max_run_count)
 
-            prev_store_config = json.dumps(self.__store_config, sort_keys=True,
-                                           indent=2)
-            new_store_config_val = cfg_dict.get('store', {})
-            new_store_config = json.dumps(new_store_config_val, sort_keys=True,
-                                          indent=2)
+            # The configs are only serialized for logging if they differ.
+            prev_store_config = self.__store_config
+            new_store_config = cfg_dict.get('store', {})
             if prev_store_config != new_store_config:
-                self.__store_config = new_store_config_val
+                self.__set_store_config(new_store_config)
                 LOG.debug("Updating 'store' config from %s to %s",
-                          prev_store_config, new_store_config)
+                          json.dumps(prev_store_config, sort_keys=True,
+                                     indent=2),
+                          json.dumps(new_store_config, sort_keys=True,
+                                     indent=2))
 
             update_sessions = False
             auth_fields_to_update = ['session_lifetime', 'refresh_time',
-                                     'logins_until_cleanup']
+                                     'cleanup_interval']
             for field in auth_fields_to_update:
                 if field in self.__auth_config:
                     prev_value = self.__auth_config[field]
@@ -450,10 +744,20 @@ class SessionManager:
             if update_sessions:
                 # Update configuration options of the already existing
                 # sessions.
-                for session in self.__sessions:
-                    session.session_lifetime = \
-                        self.__auth_config['session_lifetime']
-                    session.refresh_time = self.__auth_config['refresh_time']
+                with self.__sessions_lock:
+                    for session in self.__sessions.values():
+                        session.session_lifetime = \
+                            self.__auth_config['session_lifetime']
+                        session.refresh_time = \
+                            self.__auth_config['refresh_time']
+
+                    self.__session_evictions = [
+                        (session.evict_time, token)
+                        for token, session in self.__sessions.items()]
+                    heapq.heapify(self.__session_evictions)
+
+            self.__refresh_enabled_methods()
+            self.__root_users.clear()
 
             LOG.info("Done.")
         except ValueError as ex:
@@ -496,16 +800,24 @@ class SessionManager:
         """ Get default superuser name. """
         return self.__auth_config['super_user']
 
-    def set_database_connection(self, connection):
+    def set_database_connection(self, connection, engine=None):
         """
         Set the instance's database connection to use in fetching
         database-stored sessions to the given connection.
 
         Use None as connection's value to unset the database.
+
+        Single statement lookups and deletions use the connections of the
+        given engine directly, without the bookkeeping of an ORM session. If
+        no engine is given, the one bound to the session factory is used.
         """
         self.__database_connection = connection
 
-    def __handle_validation(self, auth_string):
+        if connection and engine is None:
+            engine = connection.kw.get('bind')
+        self.__database_engine = engine if connection else None
+
+    def __handle_validation(self, user_name, password):
         """
         Validate an oncoming authorization request
         against some authority controller.
@@ -515,150 +827,145 @@ class SessionManager:
 
         This validation object contains two keys: username and groups.
         """
-        validation = self.__try_personal_access_token(auth_string) \
-            or self.__try_auth_dictionary(auth_string) \
-            or self.__try_auth_pam(auth_string) \
-            or self.__try_auth_ldap(auth_string)
+        # Every authentication method uses the same database session.
+        transaction = None
+        try:
+            if self.__database_connection:
+                transaction = self.__database_connection()
+
+            validation = \
+                self.__try_personal_access_token(transaction, user_name,
+                                                 password) \
+                or self.__try_auth_dictionary(transaction, user_name,
+                                              password) \
+                or self.__try_auth_pam(user_name, password) \
+                or self.__try_auth_ldap(transaction, user_name, password)
+        finally:
+            if transaction:
+                transaction.close()
+
         if not validation:
             return False
 
         # If a validation method is enabled and regex_groups is enabled too,
         # we will extend the 'groups'.
+        # The order of the groups given by the validation method is kept.
         extra_groups = self.__try_regex_groups(validation['username'])
         if extra_groups:
-            already_groups = set(validation['groups'])
-            validation['groups'] = list(already_groups | extra_groups)
+            groups = validation.setdefault('groups', [])
+            already_groups = set(groups)
+            groups.extend(g for g in extra_groups if g not in already_groups)
 
         LOG.debug('User validation details: %s', str(validation))
         return validation
 
     def __is_method_enabled(self, method):
-        return method not in UNSUPPORTED_METHODS and \
-            'method_' + method in self.__auth_config and \
-            self.__auth_config['method_' + method].get('enabled')
+        return method in self.__enabled_methods
 
-    def __try_auth_token(self, auth_string):
+    def __try_auth_token(self, user_name, token):
         if not self.__database_connection:
             return None
 
-        user_name, token = auth_string.split(':', 1)
-
-        transaction = None
         try:
             # Try the database, if it is connected.
-            transaction = self.__database_connection()
-            auth_session = transaction.query(SessionRecord.token) \
-                .filter(SessionRecord.user_name == user_name) \
-                .filter(SessionRecord.token == token) \
-                .limit(1).one_or_none()
-
-            if not auth_session:
-                return None
+            with self.__database_engine.connect() as connection:
+                has_session = connection.execute(select([
+                    exists()
+                    .where(SessionRecord.user_name == user_name)
+                    .where(SessionRecord.token == token)])).scalar()
 
-            return auth_session
+            return token if has_session else None
         except Exception as e:
             LOG.error("Couldn't check login in the database: ")
             LOG.error(str(e))
-        finally:
-            if transaction:
-                transaction.close()
 
         return None
 
-    def __try_personal_access_token(self, auth_string):
-        if not self.__database_connection:
-            return None
+    @staticmethod
+    def __personal_access_token_cache_key(user_name, token):
+        return hashlib.blake2b(f"{user_name}:{token}".encode("utf-8"),
+                               digest_size=16).digest()
 
-        user_name, token = auth_string.split(':', 1)
+    def __try_personal_access_token(self, transaction, user_name, token):
+        if not transaction:
+            return None
 
-        transaction = None
-        try:
-            transaction = self.__database_connection()
-            personal_access_token = transaction.query(PersonalAccessToken) \
-                .filter(PersonalAccessToken.user_name == user_name) \
-                .filter(PersonalAccessToken.token == token) \
-                .limit(1).one_or_none()
-        except Exception as e:
-            LOG.error("Couldn't check login in the database:")
-            LOG.error(str(e))
-        finally:
-            if transaction:
-                transaction.close()
+        cache_key = self.__personal_access_token_cache_key(user_name, token)
+        cached = self.__pat_cache.get(cache_key)
+        if cached is None:
+            try:
+                cached = transaction.query(
+                    PersonalAccessToken.user_name,
+                    PersonalAccessToken.groups,
+                    PersonalAccessToken.expiration) \
+                    .filter(PersonalAccessToken.user_name == user_name) \
+                    .filter(PersonalAccessToken.token == token) \
+                    .limit(1).one_or_none() or False
+                self.__pat_cache.set(cache_key, cached)
+            except Exception as e:
+                transaction.rollback()
+                LOG.error("Couldn't check login in the database:")
+                LOG.error(str(e))
+                return False
 
-        if not personal_access_token:
+        if not cached:
             return False
 
-        if personal_access_token.expiration < datetime.now():
+        user_name, groups, expiration = cached
+        if expiration < datetime.now():
             return False
 
         return {
-            'username': personal_access_token.user_name,
-            'groups': str(personal_access_token.groups).split(";")
+            'username': user_name,
+            'groups': str(groups).split(";")
         }
 
-    def __try_auth_dictionary(self, auth_string):
+    def invalidate_personal_access_token(self, user_name, token):
+        """
+        Drop the cached validation result of the given personal access token.
+        """
+        self.__pat_cache.pop(
+            self.__personal_access_token_cache_key(user_name, token))
+
+    def __try_auth_dictionary(self, transaction, username, password):
         """
         Try to authenticate the user against the hardcoded credential list.
 
         Returns a validation object if successful, which contains the users'
         groups.
         """
-        method_config = self.__auth_config.get('method_dictionary')
-        if not method_config:
-            return False
-
         if not self.__is_method_enabled('dictionary'):
             return False
 
-        auth_string_split = auth_string.split(':', 1)
-        username = auth_string_split[0]
-
-        saved_auth_string = [auth for auth in method_config.get('auths')
-                             if auth.split(':', 1)[0] == username]
-        if len(saved_auth_string) == 0:
+        user = self.__dictionary_users.get(username)
+        if not user or user.password is None:
             return False
 
-        saved_auth_string = saved_auth_string[0]
-        if saved_auth_string != auth_string:
-            saved_auth_string_split = saved_auth_string.split(':', 3)
-            try:
-                hash_algorithm = saved_auth_string_split[2]
-            except IndexError:
+        if not hmac.compare_digest(user.password, password.encode("utf-8")):
+            if not user.hash_function:
                 return False
 
-            if not hasattr(hashlib, hash_algorithm):
+            password_hash = user.hash_function(
+                (password + user.salt).encode("utf-8")).hexdigest()
+            if not hmac.compare_digest(user.password_hash,
+                                       password_hash.encode("utf-8")):
                 return False
 
-            password = auth_string_split[1]
-            try:
-                salt = saved_auth_string_split[3]
-                password += salt
-            except IndexError:
-                pass
-
-            password = password.encode("utf-8")
-            saved_password_hash = saved_auth_string_split[1]
-            if not saved_password_hash == \
-                    getattr(hashlib, hash_algorithm)(password).hexdigest():
-                return False
+        group_list = list(user.groups)
 
-        group_list = method_config['groups'][username] if \
-            'groups' in method_config and \
-            username in method_config['groups'] else []
-
-        self.__update_personal_access_token_groups(username, group_list)
+        self.__update_personal_access_token_groups(transaction, username,
+                                                   group_list)
 
         return {
             'username': username,
             'groups': group_list
         }
 
-    def __try_auth_pam(self, auth_string):
+    def __try_auth_pam(self, username, password):
         """
         Try to authenticate user based on the PAM configuration.
         """
         if self.__is_method_enabled('pam'):
-            username, password = auth_string.split(':', 1)
             if cc_pam.auth_user(self.__auth_config['method_pam'],
                                 username, password):
                 # PAM does not hold a group membership list we can reliably
@@ -667,20 +974,19 @@ class SessionManager:
 
         return False
 
-    def __try_auth_ldap(self, auth_string):
+    def __try_auth_ldap(self, transaction, username, password):
         """
         Try to authenticate user to all the configured authorities.
         """
         if self.__is_method_enabled('ldap'):
-            username, password = auth_string.split(':', 1)
-
             ldap_authorities = self.__auth_config['method_ldap'] \
                 .get('authorities')
             for ldap_conf in ldap_authorities:
                 if cc_ldap.auth_user(ldap_conf, username, password):
                     groups = cc_ldap.get_groups(ldap_conf, username, password)
-                    self.__update_groups(username, groups)
+                    self.__update_groups(transaction, username, groups)
                     self.__update_personal_access_token_groups(
+                        transaction,
                         username,
                         groups
                     )
@@ -688,72 +994,80 @@ class SessionManager:
 
         return False
 
-    def __update_personal_access_token_groups(self, user_name, groups):
+    def __update_personal_access_token_groups(self, transaction, user_name,
+                                              groups):
         """
         Update the groups assigned to a personal access token.
         """
-        if not self.__database_connection:
+        if not transaction:
             return None
 
-        transaction = None
+        groups_str = ';'.join(groups)
         try:
-            transaction = self.__database_connection()
-            transaction.query(PersonalAccessToken) \
+            # Only the tokens with changed groups are written.
+            updated = transaction.query(PersonalAccessToken) \
                 .filter(PersonalAccessToken.user_name == user_name) \
-                .update({PersonalAccessToken.groups: ';'.join(groups)})
+                .filter(or_(PersonalAccessToken.groups.is_(None),
+                            PersonalAccessToken.groups != groups_str)) \
+                .update({PersonalAccessToken.groups: groups_str},
+                        synchronize_session=False)
             transaction.commit()
+
+            # The cached validation results may hold the old groups.
+            if updated:
+                self.__pat_cache.clear()
             return True
         except Exception as e:
-            LOG.error(
-                f"Couldn't find personal access token for user "
-                f"{user_name}: {str(e)}")
-        finally:
-            if transaction:
-                transaction.close()
+            transaction.rollback()
+            LOG.error("Couldn't find personal access token for user %s: %s",
+                      user_name, e)
 
         return False
 
-    def __update_groups(self, user_name, groups):
+    def __update_groups(self, transaction, user_name, groups):
         """
         Updates group field of the users tokens.
         """
-        if not self.__database_connection:
+        # Keep the groups of the user's local sessions in sync with the
+        # database.
+        with self.__sessions_lock:
+            for token in self.__sessions_by_user.get(user_name, ()):
+                self.__sessions[token].groups = groups
+
+        if not transaction:
             return None
 
-        transaction = None
+        groups_str = ';'.join(groups)
         try:
-            # Try the database, if it is connected.
-            transaction = self.__database_connection()
+            # Only the sessions with changed groups are written.
             transaction.query(SessionRecord) \
                 .filter(SessionRecord.user_name == user_name) \
-                .update({SessionRecord.groups: ';'.join(groups)})
+                .filter(or_(SessionRecord.groups.is_(None),
+                            SessionRecord.groups != groups_str)) \
+                .update({SessionRecord.groups: groups_str},
+                        synchronize_session=False)
             transaction.commit()
             return True
         except Exception as e:
+            transaction.rollback()
             LOG.error("Couldn't check login in the database: ")
             LOG.error(str(e))
-        finally:
-            if transaction:
-                transaction.close()
 
         return False
 
     def __try_regex_groups(self, username):
         """
-        Return a set of groups that the user belongs to, depending on whether
-        the username matches the regular expression of the group.
-
+        Return a list of groups that the user belongs to, depending on whether
+        the username matches the regular expression of the group. The groups
+        are listed in the order of the configuration, so the same user gets
+        the same groups string every time.
         """
         if not self.__regex_groups_enabled:
-            return set()
+            return []
 
-        matching_groups = set()
-        for group_name, regex_list in self.__group_regexes_compiled.items():
-            for r in regex_list:
-                if re.search(r, username):
-                    matching_groups.add(group_name)
-
-        return matching_groups
+        return [group_name for group_name, patterns
+                in self.__group_regexes_compiled.items()
+                if any(pattern.search(username) for pattern in patterns)]
 
     @staticmethod
     def get_user_name(auth_string):
@@ -765,24 +1079,33 @@ class SessionManager:
                 self.__auth_config['super_user'] == user_name:
             return True
 
-        transaction = None
+        is_root = self.__root_users.get(user_name)
+        if is_root is not None:
+            return is_root
+
         try:
             # Try the database, if it is connected.
-            transaction = self.__database_connection()
-            system_permission = transaction.query(SystemPermission) \
-                .filter(SystemPermission.name == user_name) \
-                .filter(SystemPermission.permission == SUPERUSER.name) \
-                .limit(1).one_or_none()
-            return bool(system_permission)
+            with self.__database_engine.connect() as connection:
+                is_root = bool(connection.execute(select([
+                    exists()
+                    .where(SystemPermission.name == user_name)
+                    .where(SystemPermission.permission == SUPERUSER.name)]))
+                    .scalar())
+            self.__root_users.set(user_name, is_root)
+            return is_root
         except Exception as e:
             LOG.error("Couldn't get system permission from database: ")
             LOG.error(str(e))
-        finally:
-            if transaction:
-                transaction.close()
 
         return False
 
+    def invalidate_root_users(self):
+        """
+        Drop the cached superuser permissions of the users, so the next
+        sessions see the changed permissions.
+        """
+        self.__root_users.clear()
+
     def __create_local_session(self, token, user_name, groups, is_root,
                                last_access=None):
         """
@@ -793,31 +1116,133 @@ class SessionManager:
         return _Session(
             token, user_name, groups,
             self.__auth_config['session_lifetime'],
-            self.__refresh_time, is_root, self.__database_connection,
+            self.__refresh_time, is_root, self.__mark_session_accessed,
             last_access)
 
+    def __mark_session_accessed(self, session):
+        """
+        Register the last access of the given session to be written to the
+        database by the next flush.
+        """
+        if not self.__database_connection:
+            return
+
+        with self.__accessed_sessions_lock:
+            self.__accessed_sessions[session.token] = datetime.now()
+
+            # Threads are not inherited by the forked worker processes, so
+            # every process has to start its own flusher. The check is done
+            # under the lock, so concurrent requests start only one.
+            if self.__flusher_pid != os.getpid():
+                self.__flusher_pid = os.getpid()
+                self.__flusher = threading.Thread(
+                    target=self.__flush_session_accesses_forever,
+                    name="session-access-flusher",
+                    daemon=True)
+                self.__flusher.start()
+
+    def __flush_session_accesses_forever(self):
+        while not self.__shutdown_event.wait(
+                max(1, (self.__refresh_time or 60) / 4)):
+            self.flush_session_accesses()
+
+        # Write the accesses registered since the last flush before stopping.
+        self.flush_session_accesses()
+
+    def flush_session_accesses(self):
+        """
+        Write the last access timestamps of the recently accessed sessions to
+        the database in a single batch.
+        """
+        with self.__accessed_sessions_lock:
+            accessed_sessions = self.__accessed_sessions
+            self.__accessed_sessions = {}
+
+        if not accessed_sessions or not self.__database_connection:
+            return
+
+        sessions_table = SessionRecord.__table__
+        transaction = None
+        try:
+            transaction = self.__database_connection()
+            transaction.execute(
+                sessions_table.update()
+                .where(sessions_table.c.token == bindparam('b_token'))
+                .values(last_access=bindparam('b_last_access')),
+                [{'b_token': token, 'b_last_access': last_access}
+                 for token, last_access in accessed_sessions.items()])
+            transaction.commit()
+        except Exception as e:
+            LOG.warning("Couldn't update usage timestamp of %d sessions",
+                        len(accessed_sessions))
+            LOG.warning(str(e))
+        finally:
+            if transaction:
+                transaction.close()
+
+    def __add_local_session(self, session):
+        """ Register the given session in the local in memory store. """
+        with self.__sessions_lock:
+            self.__sessions[session.token] = session
+            self.__sessions_by_user.setdefault(session.user, set()) \
+                .add(session.token)
+            heapq.heappush(self.__session_evictions,
+                           (session.evict_time, session.token))
+
+            # Threads are not inherited by the forked worker processes, so
+            # every process which stores sessions has to start its own
+            # cleanup. The check is done under the lock, so concurrent
+            # requests start only one.
+            if self.__cleanup_pid != os.getpid():
+                self.__cleanup_pid = os.getpid()
+                threading.Thread(target=self.__cleanup_sessions_forever,
+                                 name="session-cleanup",
+                                 daemon=True).start()
+
+    def __remove_local_session(self, token):
+        """
+        Remove the session of the given token from the local in memory store.
+        Returns the removed session or None if no such session was found.
+        """
+        with self.__sessions_lock:
+            session = self.__sessions.pop(token, None)
+            if session:
+                user_tokens = self.__sessions_by_user.get(session.user)
+                if user_tokens is not None:
+                    user_tokens.discard(token)
+                    if not user_tokens:
+                        del self.__sessions_by_user[session.user]
+        return session
+
     def create_session(self, auth_string):
         """ Creates a new session for the given auth-string. """
         if not self.__auth_config['enabled']:
             return None
 
-        # Perform cleanup of session memory, if neccessary.
-        self.__logins_since_prune += 1
-        if self.__logins_since_prune >= \
-                self.__auth_config['logins_until_cleanup']:
-            self.__cleanup_sessions()
+        # The auth string is split only once, every authentication method
+        # gets the user name and the password (or token) from here.
+        try:
+            user_name, password = auth_string.split(':', 1)
+        except ValueError:
+            return False
 
         # Try authenticate user with session auth token.
-        auth_token = self.__try_auth_token(auth_string)
+        auth_token = self.__try_auth_token(user_name, password)
         if auth_token:
-            local_session = self.__get_local_session_from_db(
-                auth_token.token)
-            local_session.revalidate()
-            self.__sessions.append(local_session)
-            return local_session
+            # Reuse the local session of the token if it is still alive.
+            # Only the sessions loaded from the database are stored, the
+            # stored ones are already scheduled for eviction.
+            local_session = self.__sessions.get(auth_token)
+            if local_session and local_session.revalidate():
+                return local_session
+
+            local_session = self.__get_local_session_from_db(auth_token)
+            if local_session and local_session.revalidate():
+                self.__add_local_session(local_session)
+                return local_session
 
         # Try to authenticate user with different authentication methods.
-        validation = self.__handle_validation(auth_string)
+        validation = self.__handle_validation(user_name, password)
         if not validation:
             return False
 
@@ -829,7 +1254,7 @@ class SessionManager:
 
         local_session = self.__create_local_session(token, user_name,
                                                     groups, is_root)
-        self.__sessions.append(local_session)
+        self.__add_local_session(local_session)
 
         # Store the session in the database.
         transaction = None
@@ -837,7 +1262,7 @@ class SessionManager:
             try:
                 transaction = self.__database_connection()
                 record = SessionRecord(token, user_name,
-                                       ';'.join(groups))
+                                       local_session.groups_str)
                 transaction.add(record)
                 transaction.commit()
             except Exception as e:
@@ -871,16 +1296,12 @@ class SessionManager:
         if groups is None:
             groups = []
 
-        LOG.debug(f"Groups assigned to oauth_session: {groups}")
+        LOG.debug("Groups assigned to oauth_session: %s", groups)
 
         if not self.__is_method_enabled('oauth'):
             return False
 
-        providers = self.__auth_config.get(
-            'method_oauth', {}).get("providers", {})
-
-        if provider not in providers or \
-                not providers.get(provider).get('enabled'):
+        if not self.__oauth_providers.get(provider, {}).get('enabled'):
             return False
 
         # Generate a new token and create a local session.
@@ -898,9 +1319,7 @@ class SessionManager:
             user_data.get('groups'),
             user_data.get('is_root'))
 
-        self.__sessions.append(local_session)
-
-        self.__update_personal_access_token_groups(username, groups)
+        self.__add_local_session(local_session)
 
         # Store the session in the database.
         transaction = None
@@ -908,22 +1327,22 @@ class SessionManager:
             try:
                 transaction = self.__database_connection()
 
+                self.__update_personal_access_token_groups(transaction,
+                                                           username, groups)
+
                 # Store the new session.
                 record = SessionRecord(codechecker_session_token,
                                        user_data.get('username'),
-                                       ';'.join(user_data.get('groups')))
+                                       local_session.groups_str)
                 transaction.add(record)
-                # Store oauth token data
-                session_id = transaction.query(SessionRecord.id) \
-                    .filter(SessionRecord.user_name ==
-                            user_data.get('username')) \
-                    .first()
 
+                # Store oauth token data. Its session id is set from the
+                # record when both are flushed by the commit.
                 oauth_token_session = OAuthToken(
                                                  access_token=access_token,
                                                  expires_at=token_expires_at,
                                                  refresh_token=refresh_token,
-                                                 auth_session_id=session_id[0]
+                                                 session=record
                                                  )
                 transaction.add(oauth_token_session)
                 transaction.commit()
@@ -952,41 +1371,39 @@ class SessionManager:
         analysis statistics information on the server.
         """
 
-        return self.__store_config.get('analysis_statistics_dir')
+        return self.__analysis_statistics_dir
 
     def get_failure_zip_size(self):
         """
         Maximum size of the collected failed zips which can be store on the
         server.
         """
-        limit = self.__store_config.get('limit', {})
-        return limit.get('failure_zip_size')
+        return self.__failure_zip_size
 
     def get_compilation_database_size(self):
         """
         Limit of the compilation database file size.
         """
-        limit = self.__store_config.get('limit', {})
-        return limit.get('compilation_database_size')
+        return self.__compilation_database_size
 
     def is_keepalive_enabled(self):
         """
         True if the keepalive functionality is explicitly enabled, otherwise it
         will return False.
         """
-        return self.__keepalive_config.get('enabled')
+        return self.__keepalive_enabled
 
     def get_keepalive_idle(self):
         """ Get keepalive idle time. """
-        return self.__keepalive_config.get('idle')
+        return self.__keepalive_idle
 
     def get_keepalive_interval(self):
         """ Get keepalive interval time. """
-        return self.__keepalive_config.get('interval')
+        return self.__keepalive_interval
 
     def get_keepalive_max_probe(self):
         """ Get keepalive max probe count. """
-        return self.__keepalive_config.get('max_probe')
+        return self.__keepalive_max_probe
 
     def __get_local_session_from_db(self, token):
         """
@@ -997,32 +1414,31 @@ class SessionManager:
         if not self.__database_connection:
             return None
 
-        transaction = None
         try:
-            transaction = self.__database_connection()
-            db_record = transaction.query(SessionRecord) \
-                .filter(SessionRecord.token == token) \
-                .limit(1).one_or_none()
-
-            if db_record:
-                user_name = db_record.user_name
-                is_root = self.__is_root_user(user_name)
-
-                groups = db_record.groups.split(';') \
-                    if db_record.groups else []
-
-                return self.__create_local_session(token, user_name,
-                                                   groups,
-                                                   is_root,
-                                                   db_record.last_access)
+            with self.__database_engine.connect() as connection:
+                db_record = connection.execute(
+                    select([SessionRecord.user_name,
+                            SessionRecord.groups,
+                            SessionRecord.last_access])
+                    .where(SessionRecord.token == token)
+                    .limit(1)).first()
         except Exception as e:
             LOG.error("Couldn't check login in the database: ")
             LOG.error(str(e))
-        finally:
-            if transaction:
-                transaction.close()
+            return None
 
-        return None
+        if not db_record:
+            return None
+
+        user_name = db_record.user_name
+        is_root = self.__is_root_user(user_name)
+
+        groups = _split_groups(db_record.groups)
+
+        return self.__create_local_session(token, user_name,
+                                           groups,
+                                           is_root,
+                                           db_record.last_access)
 
     def get_session(self, token):
         """
@@ -1037,22 +1453,27 @@ class SessionManager:
         if not self.is_enabled:
             return None
 
-        for sess in self.__sessions:
-            if sess.is_alive and sess.token == token:
-                # If the session is alive but the should be re-validated.
-                if sess.is_refresh_time_expire:
-                    sess.revalidate()
-                return sess
+        # Lookups are not locked: a single dict operation is atomic, and only
+        # the writers of the local store have to be serialized.
+        sess = self.__sessions.get(token)
+        if sess and sess.revalidate():
+            return sess
+
+        if self.__rejected_session_tokens.get(token):
+            return None
 
-        # Try to get a local session from the database.
+        # Try to get a local session from the database. The session is
+        # revalidated before it is stored, so the periodic cleanup does not
+        # drop it right away.
         local_session = self.__get_local_session_from_db(token)
-        if local_session and local_session.is_alive:
-            self.__sessions.append(local_session)
-            if local_session.is_refresh_time_expire:
-                local_session.revalidate()
+        if local_session and local_session.revalidate():
+            self.__add_local_session(local_session)
             return local_session
 
-        self.invalidate(token)
+        # Only remember the token if the database could be reached, so a
+        # temporary database failure does not reject valid sessions.
+        if self.invalidate(token):
+            self.__rejected_session_tokens.set(token, True)
 
         return None
 
@@ -1060,48 +1481,141 @@ class SessionManager:
         """
         Remove a user's previous session from the local in memory store.
         """
-        for session in self.__sessions[:]:
-            if session.token == token:
-                self.__sessions.remove(session)
-                return True
-        return False
+        return self.__remove_local_session(token) is not None
 
     def invalidate(self, token):
         """
         Remove a user's previous session from local in memory and the database
         store.
         """
-        transaction = None
-        try:
-            self.invalidate_local_session(token)
+        return self.invalidate_many([token])
+
+    def invalidate_many(self, tokens):
+        """
+        Remove the sessions of the given tokens from the local in memory and
+        the database store. The database is cleaned up by a single query.
+        """
+        # The tokens are used twice, so an iterator must not be consumed by
+        # the first use.
+        tokens = list(tokens)
+        if not tokens:
+            return True
 
-            transaction = self.__database_connection() \
-                if self.__database_connection else None
+        try:
+            for token in tokens:
+                self.invalidate_local_session(token)
 
             # Remove sessions from the database.
-            if transaction:
-                transaction.query(SessionRecord) \
-                    .filter(SessionRecord.token == token) \
-                    .delete()
-                transaction.commit()
+            if self.__database_engine:
+                sessions_table = SessionRecord.__table__
+                with self.__database_engine.begin() as connection:
+                    connection.execute(
+                        sessions_table.delete()
+                        .where(sessions_table.c.token.in_(tokens)))
 
             return True
         except Exception as e:
-            LOG.error("Couldn't invalidate session for token %s", token)
+            LOG.error("Couldn't invalidate session for tokens %s",
+                      ', '.join(tokens))
             LOG.error(str(e))
-        finally:
-            if transaction:
-                transaction.close()
 
         return False
 
+    def prune_expired(self):
+        """
+        Remove the sessions which exceeded their lifetime from the local in
+        memory store and from the database. The database is cleaned up by a
+        single query.
+
+        Sessions are dropped from the local store by the eviction heap, so
+        the store is not copied and scanned. The sessions whose refresh time
+        expired are dropped too, these are reloaded from the database on
+        their next use.
+        """
+        self.__evict_local_sessions()
+        return self.__prune_expired_records()
+
+    def __prune_expired_records(self):
+        """
+        Remove the sessions which exceeded their lifetime from the database
+        by a single query. The OAuth tokens of the removed sessions are
+        deleted by the database, as their foreign key cascades on delete.
+        """
+        if not self.__database_engine:
+            return False
+
+        cutoff = datetime.now() - \
+            timedelta(seconds=self.__auth_config['session_lifetime'])
+
+        sessions_table = SessionRecord.__table__
+        try:
+            with self.__database_engine.begin() as connection:
+                connection.execute(
+                    sessions_table.delete()
+                    .where(sessions_table.c.last_access < cutoff))
+            return True
+        except Exception as e:
+            LOG.error("Couldn't remove expired sessions from the database")
+            LOG.error(str(e))
+
+        return False
+
+    def __cleanup_sessions_forever(self):
+        while not self.__shutdown_event.wait(
+                self.__auth_config.get('cleanup_interval') or
+                SESSION_CLEANUP_INTERVAL):
+            self.__cleanup_sessions()
+
     def __cleanup_sessions(self):
-        self.__logins_since_prune = 0
+        try:
+            self.prune_expired()
+        except Exception as e:
+            LOG.error("Couldn't clean up expired sessions")
+            LOG.error(str(e))
+
+    def shutdown(self, timeout=SESSION_ACCESS_FLUSH_TIMEOUT):
+        """
+        Stop the background threads of the session manager. The pending
+        session accesses are written to the database by the flusher thread
+        of the current process before it stops, this waits for at most
+        timeout seconds for it.
+
+        This must not be called from a signal handler, as the flusher thread
+        may wait for a lock held by the interrupted code.
+        """
+        self.__shutdown_event.set()
 
-        for s in self.__sessions:
-            if s.is_refresh_time_expire:
-                self.invalidate_local_session(s.token)
+        with self.__accessed_sessions_lock:
+            flusher = self.__flusher \
+                if self.__flusher_pid == os.getpid() else None
 
-        for s in self.__sessions:
-            if not s.is_alive:
-                self.invalidate(s.token)
+        # Without a flusher thread no session was accessed in this process.
+        if flusher:
+            flusher.join(timeout)
+
+    def __evict_local_sessions(self):
+        """
+        Remove the sessions whose refresh time or lifetime has expired from
+        the local in memory store. Only the sessions scheduled for eviction
+        by now are visited.
+        """
+        now = time.monotonic()
+        while True:
+            # The lock is taken for one entry at a time, so a long sweep does
+            # not hold up the requests storing new sessions.
+            with self.__sessions_lock:
+                evictions = self.__session_evictions
+                if not evictions or evictions[0][0] > now:
+                    break
+
+                _, token = heapq.heappop(evictions)
+                session = self.__sessions.get(token)
+                if not session:
+                    continue
+
+                evict_time = session.evict_time
+                if evict_time <= now:
+                    self.__remove_local_session(token)
+                else:
+                    # The session was revalidated since it was scheduled.
+                    heapq.heappush(evictions, (evict_time, token))
@@ -0,0 +1,408 @@
+# -------------------------------------------------------------------------
+#
+#  Part of the CodeChecker project, under the Apache License v2.0 with
+#  LLVM Exceptions. See LICENSE for license information.
+#  SPDX-License-Identifier: Apache-2.0 WITH LLVM-exception
+#
+# -------------------------------------------------------------------------
+
+""" Unit tests for the session_manager module. """
+
+
+from datetime import datetime, timedelta
+import hashlib
+import json
+import os
+import shutil
+import unittest
+from tempfile import mkdtemp
+from unittest.mock import patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from codechecker_server import session_manager
+from codechecker_server.database.config_db_model import Base, \
+    PersonalAccessToken, Session as SessionRecord, SystemPermission
+from codechecker_server.session_manager import SessionManager, _TTLCache, \
+    _apply_template
+
+
+class FakeClock:
+    """
+    Replaces the clocks of the session manager, both the monotonic clock of
+    the time module and the wall clock of datetime.now().
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.start = datetime.now()
+
+        clock = self
+
+        class FakeDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return clock.datetime()
+
+        self.patchers = [
+            patch.object(session_manager, 'time', self),
+            patch.object(session_manager, 'datetime', FakeDatetime)]
+
+    def monotonic(self):
+        return self.now
+
+    def datetime(self):
+        """ Returns the wall clock time of the fake clock. """
+        return self.start + timedelta(seconds=self.now - 1000.0)
+
+    def start_patches(self):
+        for patcher in self.patchers:
+            patcher.start()
+
+    def stop_patches(self):
+        for patcher in self.patchers:
+            patcher.stop()
+
+
+class TTLCacheTest(unittest.TestCase):
+    """
+    Testing the cache of the session manager.
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.clock.start_patches()
+
+    def tearDown(self):
+        self.clock.stop_patches()
+
+    def test_expiry(self):
+        """ The entries expire after the given number of seconds. """
+        cache = _TTLCache(10, 60)
+        cache.set('key', 'value')
+
+        self.clock.now += 60
+        self.assertEqual(cache.get('key'), 'value')
+
+        self.clock.now += 1
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.get('key', False), False)
+
+    def test_lru_bound(self):
+        """ The least recently used entry is dropped from a full cache. """
+        cache = _TTLCache(2, 60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+
+        # Using 'a' makes 'b' the least recently used entry.
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_pop_and_clear(self):
+        """ Entries can be removed one by one or all at once. """
+        cache = _TTLCache(10, 60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+
+        cache.pop('a')
+        cache.pop('missing')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 2)
+
+        cache.clear()
+        self.assertIsNone(cache.get('b'))
+
+    def test_disabled(self):
+        """ Nothing is cached if the size or the lifetime is zero. """
+        for max_size, ttl in ((0, 60), (10, 0)):
+            cache = _TTLCache(max_size, ttl)
+            cache.set('key', 'value')
+            self.assertIsNone(cache.get('key'))
+
+
+class ApplyTemplateTest(unittest.TestCase):
+    """
+    Testing the substitution of the OAuth template variables.
+    """
+
+    def test_same_as_format(self):
+        """ The templates are substituted the same way as by str.format. """
+        variables = {'host': 'https://localhost:8080',
+                     'provider': 'github',
+                     'port': 8080}
+        for template in ('https://github.com/login/oauth/authorize',
+                         '{host}/login/OAuthLogin/{provider}',
+                         '{host}{provider}',
+                         '{{host}} is {host}',
+                         '{port:05d}',
+                         '{provider!r}'):
+            self.assertEqual(_apply_template(template, variables),
+                             template.format(**variables))
+
+    def test_undefined_variable(self):
+        """ A KeyError is raised for the undefined variables. """
+        with self.assertRaises(KeyError):
+            _apply_template('{host}/login', {'provider': 'github'})
+
+
+class SessionManagerTest(unittest.TestCase):
+    """
+    Testing the session manager with a config database.
+    """
+
+    auths = [
+        "plain:secret",
+        "colon:pass:word",
+        "hashed:" + hashlib.sha256(b"secretsalt").hexdigest() +
+        ":sha256:salt",
+        "Admin:secret",
+        "aab:secret",
+        "nopassword"
+    ]
+
+    regex_groups = {
+        'admins': ['(?i)^admin'],
+        'doubles': [r'(.)\1', '^zzz'],
+        'letters': ['^aa', 'b$'],
+        'plain_users': ['^plain$']
+    }
+
+    def setUp(self):
+        self.workspace = mkdtemp()
+
+        self.clock = FakeClock()
+        self.clock.start_patches()
+
+        config_file = os.path.join(self.workspace, 'server_config.json')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'authentication': {
+                    'enabled': True,
+                    'session_lifetime': 300,
+                    'refresh_time': 60,
+                    'cleanup_interval': 3600,
+                    'method_dictionary': {
+                        'enabled': True,
+                        'auths': self.auths,
+                        'groups': {'plain': ['group1']}
+                    },
+                    'regex_groups': {
+                        'enabled': True,
+                        'groups': self.regex_groups
+                    }
+                }
+            }, f)
+        os.chmod(config_file, 0o600)
+
+        self.engine = create_engine(
+            'sqlite:///' + os.path.join(self.workspace, 'config.sqlite'))
+        Base.metadata.create_all(self.engine)
+        self.db_session = sessionmaker(bind=self.engine)
+
+        self.manager = SessionManager(config_file)
+        self.manager.set_database_connection(self.db_session)
+
+    def tearDown(self):
+        self.manager.shutdown()
+        self.clock.stop_patches()
+        self.engine.dispose()
+        shutil.rmtree(self.workspace)
+
+    def session_tokens(self):
+        """ Returns the tokens of the sessions stored in the database. """
+        return set(self.last_accesses())
+
+    def last_accesses(self):
+        """
+        Returns the last access times of the sessions stored in the
+        database, indexed by their token.
+        """
+        with self.engine.connect() as connection:
+            return {row.token: row.last_access for row in connection.execute(
+                SessionRecord.__table__.select())}
+
+    def test_dictionary_users(self):
+        """ Log in with the credentials of the dictionary method. """
+        session = self.manager.create_session("plain:secret")
+        self.assertTrue(session)
+        self.assertEqual(session.user, 'plain')
+        self.assertEqual(session.groups, ('group1', 'plain_users'))
+
+        # Everything after the user name is the password of the legacy
+        # format.
+        self.assertTrue(self.manager.create_session("colon:pass:word"))
+        self.assertTrue(self.manager.create_session("hashed:secret"))
+
+        self.assertFalse(self.manager.create_session("plain:wrong"))
+        self.assertFalse(self.manager.create_session("plain:"))
+        self.assertFalse(self.manager.create_session("colon:pass"))
+        self.assertFalse(self.manager.create_session("hashed:wrong"))
+        self.assertFalse(self.manager.create_session("unknown:secret"))
+        self.assertFalse(self.manager.create_session("plain"))
+
+        # An entry without a password does not accept the empty password.
+        self.assertFalse(self.manager.create_session("nopassword:"))
+        self.assertFalse(self.manager.create_session("nopassword"))
+
+    def test_session_token_login(self):
+        """
+        Logging in with a session token reuses its local session without
+        scheduling it for eviction again.
+        """
+        session = self.manager.create_session("plain:secret")
+        evictions = self.manager._SessionManager__session_evictions
+        self.assertEqual(len(evictions), 1)
+
+        self.assertIs(self.manager.create_session("plain:" + session.token),
+                      session)
+        self.assertEqual(len(evictions), 1)
+
+        # The session is loaded from the database if it was evicted.
+        self.manager.invalidate_local_session(session.token)
+        reloaded = self.manager.create_session("plain:" + session.token)
+        self.assertEqual(reloaded.token, session.token)
+        self.assertIs(self.manager.get_session(session.token), reloaded)
+
+        self.assertFalse(self.manager.create_session("other:" +
+                                                     session.token))
+
+    def test_regex_groups(self):
+        """
+        The users are added to the groups whose regular expressions match
+        their name. Inline flags and backreferences apply to their own
+        expression.
+        """
+        session = self.manager.create_session("Admin:secret")
+        self.assertEqual(session.groups, ('admins',))
+
+        session = self.manager.create_session("aab:secret")
+        self.assertEqual(session.groups, ('doubles', 'letters'))
+
+        # The groups of the dictionary method come first, then the regex
+        # groups in the order of the configuration.
+        session = self.manager.create_session("plain:secret")
+        self.assertEqual(session.groups, ('group1', 'plain_users'))
+
+    def test_personal_access_token_cache(self):
+        """
+        The validations of personal access tokens are cached until the
+        token is invalidated.
+        """
+        token = 'a' * 32
+        db = self.db_session()
+        db.add(PersonalAccessToken('user', 'test', token, '',
+                                   'group1;group2', 7))
+        db.commit()
+
+        session = self.manager.create_session("user:" + token)
+        self.assertTrue(session)
+        self.assertEqual(session.groups, ('group1', 'group2'))
+
+        # The token is deleted without invalidating the cache.
+        db.query(PersonalAccessToken).delete()
+        db.commit()
+        db.close()
+        self.assertTrue(self.manager.create_session("user:" + token))
+
+        # The cache is keyed by the user name and the token together.
+        self.manager.invalidate_personal_access_token('other', token)
+        self.assertTrue(self.manager.create_session("user:" + token))
+
+        self.manager.invalidate_personal_access_token('user', token)
+        self.assertFalse(self.manager.create_session("user:" + token))
+
+    def test_root_user_cache(self):
+        """
+        The superuser permission of the users is cached until it is
+        invalidated.
+        """
+        self.assertFalse(self.manager.create_session("plain:secret").is_root)
+
+        db = self.db_session()
+        db.add(SystemPermission('SUPERUSER', 'plain'))
+        db.commit()
+        db.close()
+        self.assertFalse(self.manager.create_session("plain:secret").is_root)
+
+        self.manager.invalidate_root_users()
+        self.assertTrue(self.manager.create_session("plain:secret").is_root)
+
+    def test_invalidate_many(self):
+        """ Remove several sessions from the memory and the database. """
+        tokens = [self.manager.create_session("plain:secret").token
+                  for _ in range(3)]
+        self.assertEqual(self.session_tokens(), set(tokens))
+
+        self.assertTrue(self.manager.invalidate_many(tokens[:2]))
+
+        self.assertEqual(self.session_tokens(), {tokens[2]})
+        self.assertFalse(self.manager.invalidate_local_session(tokens[0]))
+        self.assertFalse(self.manager.invalidate_local_session(tokens[1]))
+        self.assertTrue(self.manager.invalidate_local_session(tokens[2]))
+
+    def test_invalidate_many_iterator(self):
+        """ The tokens can be given by an iterator, or none at all. """
+        tokens = [self.manager.create_session("plain:secret").token
+                  for _ in range(2)]
+
+        self.assertTrue(self.manager.invalidate_many([]))
+        self.assertEqual(self.session_tokens(), set(tokens))
+
+        self.assertTrue(self.manager.invalidate_many(t for t in tokens))
+        self.assertEqual(self.session_tokens(), set())
+
+    def test_evict_local_sessions(self):
+        """
+        The sessions are dropped from the memory when their refresh time
+        expires, unless they were used meanwhile.
+        """
+        idle = self.manager.create_session("plain:secret")
+        used = self.manager.create_session("plain:secret")
+
+        # The session is refreshed after its refresh time expired.
+        self.clock.now += 61
+        self.assertIs(self.manager.get_session(used.token), used)
+
+        self.assertTrue(self.manager.prune_expired())
+
+        self.assertFalse(self.manager.invalidate_local_session(idle.token))
+        self.assertTrue(self.manager.invalidate_local_session(used.token))
+
+        # The evicted session is still in the database.
+        self.assertIn(idle.token, self.session_tokens())
+
+    def test_flush_session_accesses(self):
+        """
+        The access times of the sessions are written to the database by the
+        flush, in one batch.
+        """
+        sessions = [self.manager.create_session("plain:secret")
+                    for _ in range(2)]
+        created = self.last_accesses()
+
+        # The sessions are refreshed after their refresh time expired.
+        self.clock.now += 61
+        for session in sessions:
+            self.assertIs(self.manager.get_session(session.token), session)
+        self.assertEqual(self.last_accesses(), created)
+
+        self.manager.flush_session_accesses()
+        self.assertEqual(self.last_accesses(),
+                         {session.token: self.clock.datetime()
+                          for session in sessions})
+
+    def test_flush_on_shutdown(self):
+        """ The pending session accesses are written by the shutdown. """
+        session = self.manager.create_session("plain:secret")
+
+        self.clock.now += 61
+        self.assertIs(self.manager.get_session(session.token), session)
+        self.manager.shutdown()
+
+        self.assertEqual(self.last_accesses(),
+                         {session.token: self.clock.datetime()})
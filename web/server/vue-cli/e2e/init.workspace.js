@@ -10,7 +10,7 @@ const SERVER_CONFIG = {
     "super_user" : "root",
     session_lifetime : 60000,
     refresh_time : 60,
-    logins_until_cleanup : 30,
+    cleanup_interval : 60,
     method_dictionary: {
       enabled : true,
       auths : [ "cc:admin",
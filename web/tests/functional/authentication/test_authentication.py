@@ -448,6 +448,47 @@ class DictAuth(unittest.TestCase):
         validate_removed = env.validate_oauth_session(session_factory, state_r)
         self.assertFalse(validate_removed, "old oauth session wasn't removed")
 
+    def test_oauth_remove_old_sessions_bulk(self):
+        """
+        Tests if several old oauth sessions, inserted by a single statement,
+        are removed from database during the login process.
+        """
+
+        session_factory = env.create_sqlalchemy_session(self._test_workspace)
+
+        # Inserting no sessions at all does nothing.
+        env.insert_oauth_sessions(session_factory, [])
+
+        # sessions of different providers that should expire on new login.
+        expires_at_r = datetime.now() \
+            - timedelta(minutes=32)
+        states = ["FAKESTATE_BULK1", "FAKESTATE_BULK2"]
+
+        env.insert_oauth_sessions(session_factory, [
+            {'state': states[0],
+             'code_verifier': "54GJITG3gVBT",
+             'provider': "github",
+             'expires_at': expires_at_r},
+            {'state': states[1],
+             'code_verifier': "54GJITG3gVBT",
+             'provider': "google",
+             'expires_at': expires_at_r}])
+
+        for state in states:
+            self.assertTrue(env.validate_oauth_session(session_factory,
+                                                       state),
+                            "Session that will be removed was not inserted")
+
+        session_token = self.try_login("github", "admin_github", "admin")\
+            .get('session_token', None)
+        self.assertIsNotNone(session_token,
+                             "Valid credentials didn't give us a token!")
+
+        for state in states:
+            self.assertFalse(env.validate_oauth_session(session_factory,
+                                                        state),
+                             "old oauth session wasn't removed")
+
     def test_oauth_wrong_callback_url_format(self):
         """
         Tests if 'always_off' provider with wrong callback URL format
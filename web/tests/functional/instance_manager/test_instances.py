@@ -45,9 +45,12 @@ class TestInstances(unittest.TestCase):
 
         test_env = env.test_env(TEST_WORKSPACE)
 
+        # The two servers need distinct ports.
+        port_1, port_2 = env.get_free_ports(2)
+
         # Setup environment variables for the test cases.
         host_port_cfg = {'viewer_host': 'localhost',
-                         'viewer_port': env.get_free_port()}
+                         'viewer_port': port_1}
 
         codechecker_cfg = {
             'workspace': TEST_WORKSPACE,
@@ -68,12 +71,7 @@ class TestInstances(unittest.TestCase):
             'analyzers': ['clangsa', 'clang-tidy']
         }
         host_port_cfg = {'viewer_host': 'localhost',
-                         'viewer_port': env.get_free_port()}
-
-        if host_port_cfg['viewer_port'] == \
-                test_config['codechecker_1']['viewer_port']:
-            host_port_cfg['viewer_port'] = \
-                int(host_port_cfg['viewer_port']) + 1
+                         'viewer_port': port_2}
 
         codechecker_cfg.update(host_port_cfg)
         test_config['codechecker_2'] = codechecker_cfg
@@ -10,6 +10,9 @@ Test environment setup and configuration helpers.
 """
 
 
+import atexit
+import copy
+from functools import lru_cache
 import os
 import json
 import tempfile
@@ -17,6 +20,7 @@ import shutil
 import socket
 import subprocess
 
+from codechecker_common.logger import get_logger
 from codechecker_common.util import load_json
 
 from .thrift_client_to_db import get_auth_client
@@ -27,7 +31,7 @@ from .thrift_client_to_db import get_viewer_client
 from functional import PKG_ROOT
 from functional import REPO_ROOT
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, exists, select
 from sqlalchemy.orm import sessionmaker
 
 from codechecker_server.database.config_db_model import OAuthToken
@@ -36,26 +40,87 @@ from codechecker_server.database.database import DBSession
 
 import datetime
 
+try:
+    import psycopg2
+    from psycopg2 import sql
+except ImportError:
+    psycopg2 = None
+
+
+LOG = get_logger('system')
+
+SERVER_CONFIG_FILENAME = "server_config.json"
+
+# Paths in the CodeChecker package, these do not change during the tests.
+_CC_BIN_DIR = os.path.join(PKG_ROOT, 'bin')
+_CC_CMD = os.path.join(_CC_BIN_DIR, 'CodeChecker')
+_CC_PATH_PREFIX = _CC_BIN_DIR + ':'
+
+# Parsed test configuration files and their modification time, keyed by their
+# path. Only the latest parsed content of a file is kept.
+_CFG_CACHE = {}
+
+# Parsed session files of the workspaces and their modification time, keyed
+# by their path. Only the latest parsed content of a file is kept.
+_SESSION_CACHE = {}
+
+# Autocommit connections to the 'postgres' maintenance database, keyed by the
+# address, port and user name of the server.
+_PG_ADMIN_CONNECTIONS = {}
+
+# SQLAlchemy engines and session factories of the config databases, keyed by
+# the path of the database file.
+_ENGINE_CACHE = {}
+
+
+@atexit.register
+def _close_pg_admin_connections():
+    for conn in _PG_ADMIN_CONNECTIONS.values():
+        conn.close()
+    _PG_ADMIN_CONNECTIONS.clear()
+
 
 def get_free_port():
     """
     Get a free port from the OS.
     """
+    return get_free_ports(1)[0]
+
+
+def get_free_ports(count):
+    """
+    Get the given number of distinct free ports from the OS. The ports are
+    bound at the same time, so the OS can not return the same port twice.
+    """
     # TODO: Prone to errors if the OS assigns port to someone else before use.
 
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    s.bind(('', 0))
-    free_port = s.getsockname()[1]
-    s.close()
+    sockets = []
+    try:
+        for _ in range(count):
+            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sockets.append(s)
+            s.bind(('', 0))
 
-    return free_port
+        return [s.getsockname()[1] for s in sockets]
+    finally:
+        for s in sockets:
+            s.close()
 
 
 def get_postgresql_cfg():
     """
     Returns PostgreSQL config if should be used based on the environment
     settings if not return none.
+
+    The environment is read only once, the callers get their own copy of the
+    config.
     """
+    pg_db_config = _get_postgresql_cfg()
+    return dict(pg_db_config) if pg_db_config else None
+
+
+@lru_cache(maxsize=None)
+def _get_postgresql_cfg():
     use_postgresql = os.environ.get('TEST_USE_POSTGRESQL', '') == 'true'
     if use_postgresql:
         pg_db_config = {'dbaddress': 'localhost',
@@ -70,6 +135,27 @@ def get_postgresql_cfg():
         return None
 
 
+def _pg_admin_connection(pg_config, env=None):
+    """
+    Returns an autocommit connection to the 'postgres' database of the
+    configured PostgreSQL server. The connection is opened once and reused by
+    the later database creations and removals.
+    """
+    key = (pg_config['dbaddress'], pg_config['dbport'],
+           pg_config.get('dbusername'))
+    conn = _PG_ADMIN_CONNECTIONS.get(key)
+    if conn is None or conn.closed:
+        conn = psycopg2.connect(host=pg_config['dbaddress'],
+                                port=pg_config['dbport'],
+                                dbname='postgres',
+                                user=pg_config.get('dbusername'),
+                                password=(env or os.environ).get(
+                                    'PGPASSWORD'))
+        conn.autocommit = True
+        _PG_ADMIN_CONNECTIONS[key] = conn
+    return conn
+
+
 def add_database(dbname, env=None):
     """
     Creates a new database with a given name.
@@ -78,7 +164,15 @@ def add_database(dbname, env=None):
     """
 
     pg_config = get_postgresql_cfg()
-    if pg_config:
+    if pg_config and psycopg2:
+        # Failures are only reported, like the exit code of psql is ignored.
+        try:
+            with _pg_admin_connection(pg_config, env).cursor() as cursor:
+                cursor.execute(sql.SQL("CREATE DATABASE {}")
+                               .format(sql.Identifier(dbname)))
+        except psycopg2.Error as err:
+            LOG.warning("Failed to create database %s: %s", dbname, err)
+    elif pg_config:
         pg_config['dbname'] = dbname
 
         psql_command = ['psql',
@@ -90,7 +184,7 @@ def add_database(dbname, env=None):
         if 'dbusername' in pg_config:
             psql_command += ['-U', pg_config['dbusername']]
 
-        print(psql_command)
+        LOG.debug("%s", psql_command)
         subprocess.call(
             psql_command,
             env=env,
@@ -105,7 +199,20 @@ def del_database(dbname, env=None):
     """
 
     pg_config = get_postgresql_cfg()
-    if pg_config:
+    if pg_config and psycopg2:
+        try:
+            with _pg_admin_connection(pg_config, env).cursor() as cursor:
+                cursor.execute("UPDATE pg_database "
+                               "SET datallowconn='false' "
+                               "WHERE datname=%s", (dbname,))
+                cursor.execute("SELECT pg_terminate_backend(pid) "
+                               "FROM pg_stat_activity "
+                               "WHERE datname=%s", (dbname,))
+                cursor.execute(sql.SQL("DROP DATABASE {}")
+                               .format(sql.Identifier(dbname)))
+        except psycopg2.Error as err:
+            LOG.warning("Failed to remove database %s: %s", dbname, err)
+    elif pg_config:
         pg_config['dbname'] = dbname
 
         remove_cmd = f"""
@@ -120,39 +227,38 @@ def del_database(dbname, env=None):
             DROP DATABASE "{dbname}";
         """
 
-        with tempfile.NamedTemporaryFile(suffix='.sql') as sql_file:
-            sql_file.write(remove_cmd.encode('utf-8'))
-            sql_file.flush()
-
-            psql_command = ['psql',
-                            '-h', pg_config['dbaddress'],
-                            '-p', str(pg_config['dbport']),
-                            '-d', 'postgres',
-                            '-f', sql_file.name]
+        # The script is passed to psql on its standard input.
+        psql_command = ['psql',
+                        '-h', pg_config['dbaddress'],
+                        '-p', str(pg_config['dbport']),
+                        '-d', 'postgres']
 
-            if 'dbusername' in pg_config:
-                psql_command += ['-U', pg_config['dbusername']]
+        if 'dbusername' in pg_config:
+            psql_command += ['-U', pg_config['dbusername']]
 
-            print(' '.join(psql_command))
-            subprocess.call(psql_command,
-                            stdout=subprocess.PIPE,
-                            stderr=subprocess.STDOUT,
-                            env=env, encoding="utf-8", errors="ignore")
+        LOG.debug("%s", ' '.join(psql_command))
+        subprocess.run(psql_command,
+                       input=remove_cmd,
+                       stdout=subprocess.PIPE,
+                       stderr=subprocess.STDOUT,
+                       env=env, encoding="utf-8", errors="ignore",
+                       check=False)
 
 
 def clang_to_test():
     return "clang_"+os.environ.get('TEST_CLANG_VERSION', 'stable')
 
 
-def setup_viewer_client(workspace,
-                        endpoint='/CodeCheckerService',
-                        auto_handle_connection=True,
-                        session_token=None, proto='http'):
-    # Read port and host from the test config file.
-    codechecker_cfg = import_test_cfg(workspace)['codechecker_cfg']
-    port = codechecker_cfg['viewer_port']
-    host = codechecker_cfg['viewer_host']
-    product = codechecker_cfg['viewer_product']
+def _setup_client(get_client, workspace, host=None, port=None,
+                  session_token=None, proto='http', **kwargs):
+    """
+    Create a client with the given get_*_client function. The host and port
+    of the server are read from the test config file if these are not set.
+    """
+    if not host and not port:
+        codechecker_cfg = import_test_cfg(workspace)['codechecker_cfg']
+        host = codechecker_cfg['viewer_host']
+        port = codechecker_cfg['viewer_port']
 
     if session_token is None:
         session_token = get_session_token(workspace, host, port)
@@ -160,13 +266,27 @@ def setup_viewer_client(workspace,
     if session_token == '_PROHIBIT':
         session_token = None
 
-    return get_viewer_client(host=host,
-                             port=port,
-                             product=product,
-                             endpoint=endpoint,
-                             auto_handle_connection=auto_handle_connection,
-                             session_token=session_token,
-                             protocol=proto)
+    return get_client(host=host,
+                      port=port,
+                      session_token=session_token,
+                      protocol=proto,
+                      **kwargs)
+
+
+def setup_viewer_client(workspace,
+                        endpoint='/CodeCheckerService',
+                        auto_handle_connection=True,
+                        session_token=None, proto='http'):
+    # Read port, host and product from the test config file.
+    codechecker_cfg = import_test_cfg(workspace)['codechecker_cfg']
+
+    return _setup_client(get_viewer_client, workspace,
+                         host=codechecker_cfg['viewer_host'],
+                         port=codechecker_cfg['viewer_port'],
+                         session_token=session_token, proto=proto,
+                         product=codechecker_cfg['viewer_product'],
+                         endpoint=endpoint,
+                         auto_handle_connection=auto_handle_connection)
 
 
 def setup_auth_client(workspace,
@@ -174,24 +294,11 @@ def setup_auth_client(workspace,
                       uri='/Authentication',
                       auto_handle_connection=True,
                       session_token=None, proto='http'):
-
-    # If the host is not set try to get it from the workspace config file.
-    if not host and not port:
-        codechecker_cfg = import_test_cfg(workspace)['codechecker_cfg']
-        port = codechecker_cfg['viewer_port']
-        host = codechecker_cfg['viewer_host']
-
-    if session_token is None:
-        session_token = get_session_token(workspace, host, port)
-
-    if session_token == '_PROHIBIT':
-        session_token = None
-
-    return get_auth_client(port=port,
-                           host=host,
-                           uri=uri,
-                           auto_handle_connection=auto_handle_connection,
-                           session_token=session_token, protocol=proto)
+    return _setup_client(get_auth_client, workspace,
+                         host=host, port=port,
+                         session_token=session_token, proto=proto,
+                         uri=uri,
+                         auto_handle_connection=auto_handle_connection)
 
 
 def setup_product_client(workspace,
@@ -200,53 +307,31 @@ def setup_product_client(workspace,
                          uri='/Products',
                          auto_handle_connection=True,
                          session_token=None, proto='http'):
-
-    # If the host is not set try to get it from the workspace config file.
-    if not host and not port:
-        codechecker_cfg = import_test_cfg(workspace)['codechecker_cfg']
-        host = codechecker_cfg['viewer_host']
-        port = codechecker_cfg['viewer_port']
-
-    if session_token is None:
-        session_token = get_session_token(workspace, host, port)
-
-    if session_token == '_PROHIBIT':
-        session_token = None
-
-    return get_product_client(port=port,
-                              host=host,
-                              product=product,
-                              uri=uri,
-                              auto_handle_connection=auto_handle_connection,
-                              session_token=session_token, protocol=proto)
+    return _setup_client(get_product_client, workspace,
+                         host=host, port=port,
+                         session_token=session_token, proto=proto,
+                         product=product,
+                         uri=uri,
+                         auto_handle_connection=auto_handle_connection)
 
 
 def setup_config_client(workspace,
                         uri='/Configuration',
                         auto_handle_connection=True,
                         session_token=None, proto='http'):
-
-    codechecker_cfg = import_test_cfg(workspace)['codechecker_cfg']
-    port = codechecker_cfg['viewer_port']
-    host = codechecker_cfg['viewer_host']
-
-    if session_token is None:
-        session_token = get_session_token(workspace, host, port)
-
-    if session_token == '_PROHIBIT':
-        session_token = None
-
-    return get_config_client(port=port,
-                             host=host,
-                             uri=uri,
-                             auto_handle_connection=auto_handle_connection,
-                             session_token=session_token, protocol=proto)
+    return _setup_client(get_config_client, workspace,
+                         session_token=session_token, proto=proto,
+                         uri=uri,
+                         auto_handle_connection=auto_handle_connection)
 
 
+# The roots are set once by the test runner, so these are resolved only once.
+@lru_cache(maxsize=None)
 def repository_root():
     return os.path.abspath(os.environ['REPO_ROOT'])
 
 
+@lru_cache(maxsize=None)
 def test_proj_root():
     return os.path.abspath(os.environ['TEST_PROJ'])
 
@@ -267,9 +352,8 @@ def parts_to_url(codechecker_cfg, product='viewer_product'):
     """
     Creates a product URL string from the test configuration dict.
     """
-    return codechecker_cfg['viewer_host'] + ':' + \
-        str(codechecker_cfg['viewer_port']) + '/' + \
-        codechecker_cfg[product]
+    return f"{codechecker_cfg['viewer_host']}:" \
+        f"{codechecker_cfg['viewer_port']}/{codechecker_cfg[product]}"
 
 
 def get_workspace(test_id='test'):
@@ -290,29 +374,38 @@ def get_workspace(test_id='test'):
 
 def clean_wp(workspace):
     if os.path.exists(workspace):
-        print("Removing workspace:" + workspace)
+        LOG.debug("Removing workspace: %s", workspace)
         shutil.rmtree(workspace, ignore_errors=True)
     os.makedirs(workspace)
 
 
 def import_test_cfg(workspace):
+    """
+    Returns the test configuration of the workspace. The file is parsed only
+    once until it is modified, the callers get their own copy of it.
+    """
     cfg_file = os.path.join(workspace, "test_config.json")
-    test_cfg = {}
-    with open(cfg_file, 'r',
-              encoding="utf-8", errors="ignore") as cfg:
-        test_cfg = json.loads(cfg.read())
-    return test_cfg
+    mtime = os.stat(cfg_file).st_mtime_ns
+    cached_mtime, test_cfg = _CFG_CACHE.get(cfg_file, (None, None))
+    if cached_mtime != mtime:
+        with open(cfg_file, 'r',
+                  encoding="utf-8", errors="ignore") as cfg:
+            test_cfg = json.load(cfg)
+        _CFG_CACHE[cfg_file] = (mtime, test_cfg)
+    return copy.deepcopy(test_cfg)
 
 
 def export_test_cfg(workspace, test_cfg):
     cfg_file = os.path.join(workspace, "test_config.json")
+    _CFG_CACHE.pop(cfg_file, None)
+
     with open(cfg_file, 'w',
               encoding="utf-8", errors="ignore") as cfg:
-        cfg.write(json.dumps(test_cfg, sort_keys=True, indent=2))
+        json.dump(test_cfg, cfg, sort_keys=True, indent=2)
 
 
 def codechecker_cmd():
-    return os.path.join(PKG_ROOT, 'bin', 'CodeChecker')
+    return _CC_CMD
 
 
 def codechecker_package():
@@ -320,20 +413,119 @@ def codechecker_package():
 
 
 def codechecker_env():
+    # The environment is copied on every call, because the tests modify
+    # os.environ (e.g. TEST_WORKSPACE) between the calls.
     checker_env = os.environ.copy()
-    cc_bin = os.path.join(codechecker_package(), 'bin')
-    checker_env['PATH'] = cc_bin + ":" + checker_env['PATH']
+    checker_env['PATH'] = _CC_PATH_PREFIX + checker_env['PATH']
     return checker_env
 
 
 def test_env(test_workspace):
-    base_env = os.environ.copy()
-    base_env['PATH'] = os.path.join(codechecker_package(), 'bin') + \
-        ':' + base_env['PATH']
+    base_env = codechecker_env()
     base_env['HOME'] = test_workspace
     return base_env
 
 
+@lru_cache(maxsize=None)
+def _load_package_server_cfg(server_config_filename):
+    cc_package = codechecker_package()
+    return load_json(os.path.join(cc_package,
+                                  'config',
+                                  server_config_filename), {})
+
+
+def get_package_server_cfg(server_config_filename=SERVER_CONFIG_FILENAME):
+    """
+    Returns the server configuration of the CodeChecker package. The file is
+    parsed only once, the callers get their own copy of it.
+    """
+    return copy.deepcopy(_load_package_server_cfg(server_config_filename))
+
+
+# Users of the dictionary authentication method of the auth-enabled server.
+_AUTH_DICTIONARY_USERS = (
+    "cc:test", "john:doe", "admin:admin123", "colon123:my:password",
+    "colon:my:password", "admin_group_user:admin123",
+    "regex_admin:blah", "permission_view_user:pvu", "root:root",
+    "hashtest1:hashtest1:this_will_fail",
+    "hashtest2:this_will_fail_too:sha512",
+    ("hashtest3:9d49be0aa9430dc908e6f6ecd1eff1c253e3aefd6df7ea"
+     "daeb2a66b797d9bba842f16963d4cc7a8dbb1b61c0f75cabb52f48a9"
+     "0d6b57b453ae4f85c4352e269f:sha512"),
+    ("hashtest4:8b440a15aba9665761a279b7cd12659bf1b6527bdbe6e4"
+     "3c2ef97026a05d1efe9321b6aa6fec32c2f00aaebc2baa6aab5dc54b"
+     "bd4c9f9adc0d7d3744f5b7f3df:sha3_512"),
+    ("hashtest5:33a3060019fb2bb16b4eb9eb9ec59bee4ccc658a9e3186"
+     "68e6ff0b142d523a0de571adf979428872eb2eb3fd34821687e09b92"
+     "f765ebc5ddbf9ea3cae76d292f:sha3_512:with:salt"))
+
+# OAuth authentication config of the auth-enabled server. Every server
+# configuration gets its own copy of it.
+_AUTH_OAUTH_CONFIG = {
+    "enabled": True,
+    "shared_variables": {
+        "host": "http://localhost:8080",
+        "oauth_host": "http://localhost:3000"
+    },
+    "providers": {
+        "github": {
+            "enabled": True,
+            "client_id": "1",
+            "client_secret": "1",
+            "template": "github/v1",
+            "authorization_url": "{oauth_host}/login",
+            "token_url": "{oauth_host}/token",
+            "user_info_url": "{oauth_host}/get_user",
+            "user_emails_url": "https://api.github.com/user/emails",
+            "scope": "openid email profile",
+            "user_info_mapping": {
+                "username": "login"
+            }
+        },
+        "google": {
+            "enabled": True,
+            "client_id": "2",
+            "client_secret": "2",
+            "template": "google/v1",
+            "authorization_url": "{oauth_host}/login",
+            "token_url": "{oauth_host}/token",
+            "user_info_url": "{oauth_host}/get_user",
+            "scope": "openid email profile",
+            "user_info_mapping": {
+                "username": "email"
+            }
+        },
+        "dummy": {
+            "enabled": True,
+            "client_id": "3",
+            "client_secret": "3",
+            "template": "github/v1",
+            "authorization_url": "{oauth_host}/login",
+            "token_url": "{oauth_host}/token",
+            "user_info_url": "{oauth_host}/get_user",
+            "scope": "openid email profile",
+            "user_info_mapping": {
+                "username": "email"
+            }
+        },
+        "always_off": {
+            "enabled": True,
+            "client_id": "4",
+            "client_secret": "4",
+            "template": "github/v1",
+            "authorization_url": "{oauth_host}/login",
+            "callback_url": "https://gjtujg//loginOAuthLogin/fakeprovider",
+            "token_url": "{oauth_host}/token",
+            "user_info_url": "{oauth_host}/get_user",
+            "scope": "openid email profile",
+            "user_info_mapping": {
+                "username": "email"
+            }
+        }
+    }
+}
+
+
 def enable_auth(workspace):
     """
     Create a dummy authentication-enabled configuration and
@@ -343,106 +535,22 @@ def enable_auth(workspace):
     server_config.json) is FALSE for authentication.enabled.
     """
 
-    server_config_filename = "server_config.json"
-
-    cc_package = codechecker_package()
-    original_auth_cfg = os.path.join(cc_package,
-                                     'config',
-                                     server_config_filename)
-
-    shutil.copy(original_auth_cfg, workspace)
+    server_cfg_file = os.path.join(workspace, SERVER_CONFIG_FILENAME)
 
-    server_cfg_file = os.path.join(workspace,
-                                   server_config_filename)
-
-    scfg_dict = load_json(server_cfg_file, {})
+    scfg_dict = get_package_server_cfg()
     scfg_dict["authentication"]["enabled"] = True
     scfg_dict["authentication"]["failed_auth_message"] = \
         "Personal access token based authentication only"
     scfg_dict["authentication"]["super_user"] = "root"
     scfg_dict["authentication"]["method_dictionary"]["enabled"] = True
     scfg_dict["authentication"]["method_dictionary"]["auths"] = \
-        ["cc:test", "john:doe", "admin:admin123", "colon123:my:password",
-         "colon:my:password", "admin_group_user:admin123",
-         "regex_admin:blah", "permission_view_user:pvu", "root:root",
-         "hashtest1:hashtest1:this_will_fail",
-         "hashtest2:this_will_fail_too:sha512",
-         ("hashtest3:9d49be0aa9430dc908e6f6ecd1eff1c253e3aefd6df7ea"
-          "daeb2a66b797d9bba842f16963d4cc7a8dbb1b61c0f75cabb52f48a9"
-          "0d6b57b453ae4f85c4352e269f:sha512"),
-         ("hashtest4:8b440a15aba9665761a279b7cd12659bf1b6527bdbe6e4"
-          "3c2ef97026a05d1efe9321b6aa6fec32c2f00aaebc2baa6aab5dc54b"
-          "bd4c9f9adc0d7d3744f5b7f3df:sha3_512"),
-         ("hashtest5:33a3060019fb2bb16b4eb9eb9ec59bee4ccc658a9e3186"
-          "68e6ff0b142d523a0de571adf979428872eb2eb3fd34821687e09b92"
-          "f765ebc5ddbf9ea3cae76d292f:sha3_512:with:salt")]
+        list(_AUTH_DICTIONARY_USERS)
     scfg_dict["authentication"]["method_dictionary"]["groups"] = \
         {"admin_group_user": ["admin_GROUP"]}
     scfg_dict["authentication"]["regex_groups"]["enabled"] = True
 
-    scfg_dict["authentication"]["method_oauth"] = {
-        "enabled": True,
-        "shared_variables": {
-            "host": "http://localhost:8080",
-            "oauth_host": "http://localhost:3000"
-        },
-        "providers": {
-            "github": {
-                "enabled": True,
-                "client_id": "1",
-                "client_secret": "1",
-                "template": "github/v1",
-                "authorization_url": "{oauth_host}/login",
-                "token_url": "{oauth_host}/token",
-                "user_info_url": "{oauth_host}/get_user",
-                "user_emails_url": "https://api.github.com/user/emails",
-                "scope": "openid email profile",
-                "user_info_mapping": {
-                    "username": "login"
-                }
-            },
-            "google": {
-                "enabled": True,
-                "client_id": "2",
-                "client_secret": "2",
-                "template": "google/v1",
-                "authorization_url": "{oauth_host}/login",
-                "token_url": "{oauth_host}/token",
-                "user_info_url": "{oauth_host}/get_user",
-                "scope": "openid email profile",
-                "user_info_mapping": {
-                    "username": "email"
-                }
-            },
-            "dummy": {
-                "enabled": True,
-                "client_id": "3",
-                "client_secret": "3",
-                "template": "github/v1",
-                "authorization_url": "{oauth_host}/login",
-                "token_url": "{oauth_host}/token",
-                "user_info_url": "{oauth_host}/get_user",
-                "scope": "openid email profile",
-                "user_info_mapping": {
-                    "username": "email"
-                }
-            },
-            "always_off": {
-                "enabled": True,
-                "client_id": "4",
-                "client_secret": "4",
-                "template": "github/v1",
-                "authorization_url": "{oauth_host}/login",
-                "callback_url": "https://gjtujg//loginOAuthLogin/fakeprovider",
-                "token_url": "{oauth_host}/token",
-                "user_info_url": "{oauth_host}/get_user",
-                "scope": "openid email profile",
-                "user_info_mapping": {
-                    "username": "email"
-                }
-            }
-        }
-    }
+    scfg_dict["authentication"]["method_oauth"] = \
+        copy.deepcopy(_AUTH_OAUTH_CONFIG)
     with open(server_cfg_file, 'w',
               encoding="utf-8", errors="ignore") as scfg:
         json.dump(scfg_dict, scfg, indent=2, sort_keys=True)
@@ -453,19 +561,9 @@ def enable_storage_of_analysis_statistics(workspace):
     Enables storing analysis statistics information for the server.
     """
 
-    server_config_filename = "server_config.json"
-
-    cc_package = codechecker_package()
-    original_auth_cfg = os.path.join(cc_package,
-                                     'config',
-                                     server_config_filename)
-
-    shutil.copy(original_auth_cfg, workspace)
+    server_cfg_file = os.path.join(workspace, SERVER_CONFIG_FILENAME)
 
-    server_cfg_file = os.path.join(workspace,
-                                   server_config_filename)
-
-    scfg_dict = load_json(server_cfg_file, {})
+    scfg_dict = get_package_server_cfg()
     scfg_dict["store"]["analysis_statistics_dir"] = \
         os.path.join(workspace, 'analysis_statistics')
 
@@ -489,9 +587,11 @@ def enable_ssl(workspace):
                            'ssl_example_cert',
                            'key.pem')
 
-    shutil.copy(ssl_cert, workspace)
-    shutil.copy(ssl_key, workspace)
-    print("copied "+ssl_cert+" to "+workspace)
+    # Only the content is needed, the permission bits are not copied.
+    for ssl_file in (ssl_cert, ssl_key):
+        shutil.copyfile(ssl_file,
+                        os.path.join(workspace, os.path.basename(ssl_file)))
+    LOG.debug("Copied %s to %s", ssl_cert, workspace)
 
 
 def get_session_token(workspace, viewer_host, viewer_port):
@@ -502,18 +602,26 @@ def get_session_token(workspace, viewer_host, viewer_port):
 
     try:
         session_file = os.path.join(workspace, '.codechecker.session.json')
-        with open(session_file, 'r',
-                  encoding="utf-8", errors="ignore") as sess_file:
-            sess_dict = json.load(sess_file)
+
+        # The session file is parsed again only if a login rewrote it.
+        mtime = os.stat(session_file).st_mtime_ns
+        cached_mtime, sess_dict = _SESSION_CACHE.get(session_file,
+                                                     (None, None))
+        if cached_mtime != mtime:
+            with open(session_file, 'r',
+                      encoding="utf-8", errors="ignore") as sess_file:
+                sess_dict = json.load(sess_file)
+            _SESSION_CACHE[session_file] = (mtime, sess_dict)
 
         host_port_key = viewer_host + ':' + str(viewer_port)
         return sess_dict['tokens'][host_port_key]
     except IOError as ioerr:
-        print("Could not load session for session getter because " +
-              ioerr.strerror)
+        LOG.debug("Could not load session for session getter because %s",
+                  ioerr.strerror)
         return None
     except KeyError as err:
-        print("Could not load session for session getter because " + str(err))
+        LOG.debug("Could not load session for session getter because %s",
+                  err)
         return None
 
 
@@ -524,35 +632,51 @@ def create_sqlalchemy_session(workspace):
     """
     try:
         db_path = os.path.join(workspace, 'config.sqlite')
+        cached = _ENGINE_CACHE.get(db_path)
+        if cached:
+            return cached[1]
+
         engine = create_engine('sqlite:///' + db_path)
 
         session = sessionmaker(bind=engine)
+        _ENGINE_CACHE[db_path] = (engine, session)
         return session
 
     except ImportError as err:
-        print("SQLAlchemy is not installed. Please install it to use this "
-              "function.")
+        LOG.error("SQLAlchemy is not installed. Please install it to use this "
+                  "function.")
         raise err
     except Exception as err:
-        print("An error occurred while creating the SQLAlchemy session: " +
-              str(err))
+        LOG.error("An error occurred while creating the SQLAlchemy session: "
+                  "%s", err)
         raise err
 
 
+@atexit.register
+def _dispose_engines():
+    for engine, _ in _ENGINE_CACHE.values():
+        engine.dispose()
+    _ENGINE_CACHE.clear()
+
+
+def _exists(session_alchemy, criterion):
+    """
+    Returns whether a row matching the criterion exists. Only a single
+    SELECT EXISTS is run on a plain connection of the engine which is bound
+    to the session factory, without setting up an ORM session.
+    """
+    engine = session_alchemy.kw['bind']
+    with engine.connect() as conn:
+        return bool(conn.execute(select([exists().where(criterion)]))
+                    .scalar())
+
+
 def validate_oauth_token_session(session_alchemy, access_token):
     """
     Helper function that returns bool depending
     if the OAuth token exists
     """
-
-    access_token_db = None
-    with DBSession(session_alchemy) as session:
-        access_token_db, *_ = \
-            session.query(OAuthToken.access_token) \
-            .filter(OAuthToken.access_token == access_token) \
-            .first()
-    return access_token_db is not None \
-        and access_token_db == access_token
+    return _exists(session_alchemy, OAuthToken.access_token == access_token)
 
 
 def validate_oauth_session(session_alchemy, state):
@@ -560,10 +684,7 @@ def validate_oauth_session(session_alchemy, state):
     Helper function that returns bool depending
     if the OAuth state exists
     """
-    with DBSession(session_alchemy) as session:
-        return session.query(OAuthSession.state) \
-               .filter(OAuthSession.state == state) \
-               .first() is not None
+    return _exists(session_alchemy, OAuthSession.state == state)
 
 
 def insert_oauth_session(session_alchemy,
@@ -574,25 +695,43 @@ def insert_oauth_session(session_alchemy,
     """
     Insert a new OAuth session into the database.
     """
-    if not all(isinstance(arg, str) for arg in (state,
-                                                code_verifier,
-                                                provider)):
-        raise TypeError("All OAuth fields must be strings")
-    try:
-        with DBSession(session_alchemy) as session:
+    insert_oauth_sessions(session_alchemy, [{'state': state,
+                                             'code_verifier': code_verifier,
+                                             'provider': provider,
+                                             'expires_at': expires_at}])
 
-            if expires_at is None:
-                expires_at = (datetime.datetime.now() +
-                              datetime.timedelta(minutes=15))
 
-            oauth_session_entry = OAuthSession(state=state,
-                                               code_verifier=code_verifier,
-                                               expires_at=expires_at,
-                                               provider=provider)
-            session.add(oauth_session_entry)
+def insert_oauth_sessions(session_alchemy, entries):
+    """
+    Insert new OAuth sessions into the database by a single statement.
+    The entries are dicts of the 'state', 'code_verifier', 'provider' and the
+    optional 'expires_at' fields of the sessions.
+    """
+    default_expires_at = \
+        datetime.datetime.now() + datetime.timedelta(minutes=15)
+
+    rows = []
+    for entry in entries:
+        if not all(isinstance(entry.get(field), str)
+                   for field in ('state', 'code_verifier', 'provider')):
+            raise TypeError("All OAuth fields must be strings")
+
+        rows.append({'state': entry['state'],
+                     'code_verifier': entry['code_verifier'],
+                     'provider': entry['provider'],
+                     'expires_at': entry.get('expires_at') or
+                     default_expires_at})
+
+    if not rows:
+        return
+
+    states = ', '.join(row['state'] for row in rows)
+    try:
+        with DBSession(session_alchemy) as session:
+            session.execute(OAuthSession.__table__.insert(), rows)
             session.commit()
 
-            print(f"State {state} inserted successfully.")
+            LOG.debug("State %s inserted successfully.", states)
     except Exception as exc:
-        print(f"Failed to insert state {state}: {exc}")
+        LOG.error("Failed to insert state %s: %s", states, exc)
         raise exc